@@ -1,33 +1,51 @@
 import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from aiogram.types import Update
 import uvicorn
 
 from create_app import TLG_PATH, TLG_URL, dp, bot, logger, config
 from tgbot.handlers.main_handlers import router as tg_router
+from services.dohod import dohod_cache
+from services.http_client import HttpClient
+from services.moex import snapshot_cache
 from services.scheduler_service import SchedulerService
+from services.update_queue import UpdateQueue
+from services.warmup import WarmUp
 
 from web_app.router import router as fastapi_router
 
 
-async def on_startup():
-    logger.info("Starting Bot")
-    logger.debug("Bot config: %s", config)
+async def set_webhook():
     webhook_info = await bot.get_webhook_info()
     if webhook_info.url != TLG_URL:
         await bot.delete_webhook()
         await bot.set_webhook(url=TLG_URL, drop_pending_updates=True)
-    logger.info("Bot started")
     logger.info(webhook_info)
+
+
+async def on_startup():
+    """Критичная часть старта: всё, что ходит в Telegram и MOEX, уходит в фоновый прогрев."""
+    logger.info("Starting Bot")
+    logger.debug("Bot config: %s", config)
+    await HttpClient.start()
     dp.include_router(tg_router)
+    UpdateQueue.start()
     await SchedulerService.start()
+    steps = {"webhook": set_webhook, "scheduler": SchedulerService.schedule_bonds, "moex": snapshot_cache.get}
+    if config.recommendations_source == "dohod":
+        steps["dohod"] = dohod_cache.get
+    WarmUp.start(steps=steps, required=["webhook"])
+    logger.info("Bot started")
 
 
 async def on_shutdown():
+    await WarmUp.stop()
+    await UpdateQueue.stop()
     await dp.storage.close()
     await bot.session.close()
+    await HttpClient.close()
     logger.info("Bot stopped")
 
 
@@ -44,8 +62,15 @@ app.include_router(fastapi_router)
 
 @app.post(path=f"/bot{TLG_PATH}", include_in_schema=False)
 async def bot_webhook(update: dict):
-    telegram_update = Update(**update)
-    await dp.feed_update(bot=bot, update=telegram_update)
+    # Обработчик не ждём: Telegram получает ответ сразу, апдейт разбирает воркер очереди
+    try:
+        telegram_update = Update.model_validate(update, context={"bot": bot})
+    except ValueError as ex:
+        logger.warning(f"Некорректный апдейт отброшен: {ex!r}")
+        return Response(status_code=200)
+    if not UpdateQueue.put(update=telegram_update):
+        return Response(status_code=503)
+    return Response(status_code=200)
 
 
 async def main():
@@ -0,0 +1,84 @@
+"""
+Чтение 10k строк bonds: ORM-сущности + model_validate против Core select + model_construct (BondsDAO.get_many).
+
+    python -m benchmarks.dao_read [--offline] [ROWS]
+
+По умолчанию строки вставляются в bonds внутри транзакции, которая в конце откатывается.
+--offline сравнивает только сборку DTO из готовых строк, без Postgres и загрузки ORM-сущностей.
+"""
+
+import asyncio
+import sys
+import time
+
+ROWS = 10_000
+REPEATS = 20
+
+
+def report(name: str, timings: list[float], rows: int):
+    best = min(timings)
+    print(f"{name:>5}: {best * 1000:.1f} ms на {rows} строк ({best / rows * 1e6:.2f} мкс/строка)")
+
+
+def offline(rows: int):
+    from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+    from models.schemas import DbBondDTO
+    from models.sql_dao import BondsDAO
+    from models.sql_models import BondDB
+
+    data = [dict(id=i, isin=f"RU{i:010d}", amount=10, cur_coupon=0, cur_nominal=1000000) for i in range(rows)]
+    entities = [BondDB(**item) for item in data]
+    fields = list(DbBondDTO.model_fields)
+    tuples = [tuple(item[field] for field in fields) for item in data]
+    timings = {"orm": [], "core": []}
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        [DbBondDTO.model_validate(obj=entity, from_attributes=True) for entity in entities]
+        timings["orm"].append(time.perf_counter() - started)
+        result = IteratorResult(SimpleResultMetaData(fields), iter(tuples))
+        started = time.perf_counter()
+        BondsDAO._to_dtos(result=result)
+        timings["core"].append(time.perf_counter() - started)
+    for name, values in timings.items():
+        report(name=name, timings=values, rows=rows)
+
+
+async def online(rows: int):
+    from sqlalchemy import insert, select
+
+    from models.schemas import DbBondDTO
+    from models.sql_dao import BondsDAO, async_session_maker, current_session, engine
+    from models.sql_models import BondDB
+
+    data = [dict(isin=f"BENCH{i:07d}", amount=10, cur_coupon=0, cur_nominal=1000000) for i in range(rows)]
+    async with async_session_maker() as session:
+        token = current_session.set(session)
+        try:
+            await session.execute(insert(BondDB), data)
+            timings = {"orm": [], "core": []}
+            for _ in range(REPEATS):
+                started = time.perf_counter()
+                result = await session.execute(select(BondDB))
+                [DbBondDTO.model_validate(obj=row, from_attributes=True) for row in result.scalars().all()]
+                timings["orm"].append(time.perf_counter() - started)
+                session.expunge_all()
+                started = time.perf_counter()
+                await BondsDAO.get_many()
+                timings["core"].append(time.perf_counter() - started)
+            total = len(await BondsDAO.get_many())
+            for name, values in timings.items():
+                report(name=name, timings=values, rows=total)
+        finally:
+            await session.rollback()
+            current_session.reset(token)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--offline"]
+    rows = int(args[0]) if args else ROWS
+    if "--offline" in sys.argv[1:]:
+        offline(rows=rows)
+    else:
+        asyncio.run(online(rows=rows))
@@ -0,0 +1,171 @@
+"""
+Сравнение разбора доски MOEX: BeautifulSoup по всему тексту против потокового MoexBoardParser.
+
+    python -m benchmarks.moex_board [TQCB|TQOB] [--live]
+
+По умолчанию доска строится генератором с фиксированным зерном: набор колонок securities и marketdata
+как у ISS, число строк как у реальной доски, поэтому размер файла и результаты воспроизводимы без сети.
+С --live доска один раз скачивается с ISS в benchmarks/fixtures/<board>.live.xml.
+"""
+
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from xml.sax.saxutils import quoteattr
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CHUNK_SIZE = 64 * 1024
+# Колонки блоков в порядке ISS (engines/stock/markets/bonds/boards/<board>/securities.xml)
+SECURITIES_COLUMNS = tuple(
+    (
+        "SECID BOARDID SHORTNAME PREVWAPRICE YIELDATPREVWAPRICE COUPONVALUE NEXTCOUPON ACCRUEDINT PREVPRICE "
+        "LOTSIZE FACEVALUE BOARDNAME STATUS MATDATE DECIMALS COUPONPERIOD ISSUESIZE PREVLEGALCLOSEPRICE "
+        "PREVDATE SECNAME REMARKS MARKETCODE INSTRID SECTORID MINSTEP FACEUNIT BUYBACKPRICE BUYBACKDATE ISIN "
+        "LATNAME REGNUMBER CURRENCYID ISSUESIZEPLACED LISTLEVEL SECTYPE COUPONPERCENT OFFERDATE SETTLEDATE "
+        "LOTVALUE FACEVALUEONSETTLEDATE CALLOPTIONDATE PUTOPTIONDATE DATEYIELDFROMISSUER BONDTYPE BONDSUBTYPE"
+    ).split()
+)
+MARKETDATA_COLUMNS = tuple(
+    (
+        "SECID BID BIDDEPTH OFFER OFFERDEPTH SPREAD BIDDEPTHT OFFERDEPTHT OPEN LOW HIGH LAST LASTCHANGE "
+        "LASTCHANGEPRCNT QTY VALUE YIELD VALUE_USD WAPRICE LASTCNGTOLASTWAPRICE WAPTOPREVWAPRICEPRCNT "
+        "WAPTOPREVWAPRICE YIELDATWAPRICE YIELDTOPREVYIELD CLOSEYIELD CLOSEPRICE MARKETPRICETODAY MARKETPRICE "
+        "LASTTOPREVPRICE NUMTRADES VOLTODAY VALTODAY VALTODAY_USD BOARDID TRADINGSTATUS UPDATETIME DURATION "
+        "NUMBIDS NUMOFFERS CHANGE TIME HIGHBID LOWOFFER PRICEMINUSPREVWAPRICE LASTBID LASTOFFER LCURRENTPRICE "
+        "LCLOSEPRICE MARKETPRICE2 OPENPERIODPRICE SEQNUM SYSTIME VALTODAY_RUR IRICPICLOSE BEICLOSE CBRCLOSE "
+        "YIELDTOOFFER YIELDLASTCOUPON TRADINGSESSION CALLOPTIONYIELD CALLOPTIONDURATION"
+    ).split()
+)
+# Число строк - порядка реальных досок TQCB и TQOB
+BOARD_ROWS = {"TQCB": 2900, "TQOB": 60}
+
+
+def fixture_path(board: str, live: bool = False) -> str:
+    return os.path.join(FIXTURES_DIR, f"{board}{'.live' if live else ''}.xml")
+
+
+def generate(board: str, path: str):
+    """Синтетическая доска с фиксированным зерном: одинаковый файл при каждом запуске."""
+    rng = random.Random(board)
+    today = date(2026, 1, 15)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+
+    def value(column: str, secid: str) -> str:
+        if column in ("SECID", "ISIN"):
+            return secid
+        if column == "BOARDID":
+            return board
+        if column in ("SHORTNAME", "SECNAME", "LATNAME", "BOARDNAME", "REMARKS"):
+            return f"{column.title()} {secid} {rng.choice(('ООО', 'ПАО', 'АО'))} БО-{rng.randint(1, 99):02d}"
+        if column in ("NEXTCOUPON", "MATDATE", "PREVDATE", "SETTLEDATE", "OFFERDATE", "BUYBACKDATE"):
+            if column in ("OFFERDATE", "BUYBACKDATE") and rng.random() < 0.8:
+                return "0000-00-00"
+            return (today + timedelta(days=rng.randint(1, 3650))).isoformat()
+        if column.endswith("DATE") or column in ("UPDATETIME", "TIME", "SYSTIME"):
+            return "" if rng.random() < 0.5 else f"{rng.randint(10, 18)}:{rng.randint(0, 59):02d}:00"
+        if column in ("FACEVALUE", "LOTVALUE", "FACEVALUEONSETTLEDATE"):
+            return rng.choice(("1000", "1000", "500", "812.5"))
+        if column in ("FACEUNIT", "CURRENCYID"):
+            return "SUR"
+        # Поля, которые читают get_bond и скринер, - в реалистичных диапазонах
+        if column == "COUPONPERIOD":
+            return rng.choice(("30", "91", "91", "182", "182", "364", "0"))
+        if column in ("PREVWAPRICE", "PREVPRICE"):
+            return "" if rng.random() < 0.1 else f"{rng.uniform(70, 110):.3f}"
+        if column == "COUPONVALUE":
+            return f"{rng.uniform(0, 60):.2f}"
+        if column == "ACCRUEDINT":
+            return f"{rng.uniform(0, 30):.2f}"
+        if column == "LOTSIZE":
+            return "1"
+        if rng.random() < 0.15:
+            return ""
+        return f"{rng.uniform(0, 10000):.4f}"
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<document>\n')
+        secids = [f"RU000A{rng.randrange(16**6):06X}" for _ in range(BOARD_ROWS.get(board, 1000))]
+        for block, columns in (("securities", SECURITIES_COLUMNS), ("marketdata", MARKETDATA_COLUMNS)):
+            file.write(f'<data id="{block}">\n<metadata>\n<columns>\n')
+            for column in columns:
+                file.write(f'<column name="{column}" type="string" bytes="50" max_size="0" />\n')
+            file.write("</columns>\n</metadata>\n<rows>\n")
+            for secid in secids:
+                attrs = " ".join(f"{column}={quoteattr(value(column, secid))}" for column in columns)
+                file.write(f"<row {attrs} />\n")
+            file.write("</rows>\n</data>\n")
+        file.write("</document>\n")
+
+
+async def record(board: str, path: str):
+    import aiohttp
+
+    from config import config
+
+    url = f"https://iss.moex.com/iss/engines/stock/markets/bonds/boards/{board}/securities.xml"
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url=url, proxy=config.rus_proxy) as resp:
+            resp.raise_for_status()
+            with open(path, "wb") as file:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    file.write(chunk)
+
+
+def run_soup(path: str) -> int:
+    from bs4 import BeautifulSoup
+
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    soup = BeautifulSoup(text, features="xml")
+    rows = soup.find(name="data", attrs={"id": "securities"}).find_all("row")
+    return len({row["SECID"]: row.attrs for row in rows})
+
+
+def run_stream(path: str) -> int:
+    from services.moex import MoexBoardParser
+
+    parser = MoexBoardParser()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            parser.feed(chunk)
+    return len(parser.close())
+
+
+def measure(method: str, path: str):
+    runner = {"soup": run_soup, "stream": run_stream}[method]
+    import bs4  # noqa: F401  импорты не должны попадать в замер
+    import services.moex  # noqa: F401
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    rows = runner(path)
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{method:>6}: {rows} rows, {elapsed * 1000:.1f} ms, peak RSS +{(rss_after - rss_before) / 1024:.1f} MiB")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--live"]
+    live = "--live" in sys.argv[1:]
+    board = args[0] if args else "TQCB"
+    path = fixture_path(board, live=live)
+    if live and not os.path.exists(path):
+        asyncio.run(record(board, path=path))
+    elif not live:
+        generate(board, path=path)
+    print(f"{board}: {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+    for method in ("soup", "stream"):
+        subprocess.run([sys.executable, "-m", "benchmarks.moex_board", "--measure", method, path], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        measure(method=sys.argv[2], path=sys.argv[3])
+    else:
+        main()
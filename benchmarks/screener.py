@@ -0,0 +1,73 @@
+"""
+Ранжирование всей доски BondScreener.screen по снимку из разобранного XML и по снимку из bond_quotes.
+
+    python -m benchmarks.screener [REPEATS]
+
+Доски TQCB и TQOB строятся тем же генератором с фиксированным зерном, что и в benchmarks.moex_board,
+поэтому замер воспроизводим без сети и Postgres. Снимок из bond_quotes имитируется пересборкой строк
+через QuotesService.to_record / to_row - с уже разобранными датами и числами.
+"""
+
+import sys
+import time
+from datetime import date
+
+from benchmarks.moex_board import fixture_path, generate
+
+REPEATS = 20
+TODAY = date(2026, 1, 15)
+
+
+def load_boards() -> list[dict]:
+    from services.moex import MoexBoardParser
+
+    boards = []
+    for board in ("TQCB", "TQOB"):
+        path = fixture_path(board)
+        generate(board, path=path)
+        parser = MoexBoardParser()
+        with open(path, "rb") as file:
+            parser.feed(file.read())
+        boards.append(parser.close())
+    return boards
+
+
+def quotes_snapshot(snapshot):
+    from models.schemas import BondQuoteDTO
+    from services.moex import MoexSnapshot
+    from services.quotes import QuotesService
+
+    quotes = [BondQuoteDTO(**QuotesService.to_record(row=row)) for row in snapshot.rows.values()]
+    return MoexSnapshot(rows={quote.isin: QuotesService.to_row(quote=quote) for quote in quotes})
+
+
+def measure(name: str, build, repeats: int):
+    from services.screener import BondScreener
+
+    timings = []
+    for _ in range(repeats):
+        snapshot = build()
+        started = time.perf_counter()
+        BondScreener.screen(snapshot=snapshot, today=TODAY)
+        timings.append(time.perf_counter() - started)
+    median = sorted(timings)[len(timings) // 2]
+    print(f"{name:>12}: {len(snapshot)} бумаг, {min(timings) * 1000:.1f} ms (медиана {median * 1000:.1f} ms)")
+
+
+def main():
+    from services.moex import MoexSnapshot
+
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+    boards = load_boards()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        board = MoexSnapshot.from_boards(boards=boards)
+        timings.append(time.perf_counter() - started)
+    print(f"    snapshot: {len(board)} бумаг, {min(timings) * 1000:.1f} ms на сборку с разбором дат")
+    measure(name="board", build=lambda: MoexSnapshot.from_boards(boards=boards), repeats=repeats)
+    measure(name="bond_quotes", build=lambda: quotes_snapshot(board), repeats=repeats)
+
+
+if __name__ == "__main__":
+    main()
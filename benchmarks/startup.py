@@ -0,0 +1,33 @@
+"""
+Время старта приложения: импорт, критичная часть lifespan (до приёма запросов) и фоновый прогрев.
+
+    python -m benchmarks.startup
+
+Запускается в рабочем окружении (.env, Postgres, Telegram, MOEX): lifespan поднимается
+так же, как под uvicorn, только без сокета.
+"""
+
+import asyncio
+import time
+
+
+async def main():
+    started = time.perf_counter()
+    from app import app
+    from services.warmup import WarmUp
+
+    imported = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        serving = time.perf_counter()
+        await WarmUp.wait()
+        warmed = time.perf_counter()
+        state = WarmUp.state()
+    print(f"   import: {(imported - started) * 1000:.0f} ms")
+    print(f"  serving: {(serving - imported) * 1000:.0f} ms после импорта")
+    print(f"   warmed: {(warmed - imported) * 1000:.0f} ms после импорта, ready={state.ready}")
+    for name, status in state.steps.items():
+        print(f"    {name}: {status}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
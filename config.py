@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -23,6 +24,42 @@ class Settings(BaseSettings):
 
     rus_proxy: str | None = None
 
+    moex_cache_ttl: int = 60
+    moex_fetch_mode: Literal["xml", "json"] = "xml"
+    moex_lookup_ratio: float = 0.01
+    quotes_refresh_interval: int = 300
+    issuers_refresh_interval: int = 86400
+    warmup_retry_delay: float = 1
+    warmup_retry_max_delay: float = 60
+    jobstore_connect_timeout: int = 5
+    moex_history_concurrency: int = 8
+
+    bonds_file_max_size: int = 1_000_000
+
+    webhook_workers: int = 8
+    webhook_queue_size: int = 100
+    webhook_dedup_size: int = 10000
+    webhook_drain_timeout: float = 10
+
+    recommendations_limit: int = 5
+    recommendations_max_issuer_weight: float | None = None
+    recommendations_min_liquidity: float = 0
+    recommendations_cash_reserve: int = 0
+    dohod_cache_ttl: int = 900
+    recommendations_source: Literal["dohod", "screener"] = "dohod"
+    screener_max_price: int = 150000
+    screener_min_yield: float = 0
+    screener_max_yield: float = 0.5
+    screener_max_duration: float = 10
+    screener_min_liquidity: float = 0
+
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 10
+    http_dns_cache_ttl: int = 300
+    http_keepalive_timeout: float = 60
+    http_total_timeout: float = 60
+    http_connect_timeout: float = 10
+
     model_config = SettingsConfigDict(env_file=env_file, env_file_encoding="utf-8", extra="ignore")
 
 
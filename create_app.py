@@ -6,6 +6,7 @@ import betterlogging as bl
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from starlette.templating import Jinja2Templates
 
@@ -26,7 +27,18 @@ database_url = (
     f"{config.db_port}/"
     f"{config.db_name}"
 )
-scheduler = AsyncIOScheduler(timezone="UTC")
+# APScheduler хранит задачи синхронно, поэтому для job store нужен драйвер psycopg2.
+# Сверку задач и /tasks приложение уводит в поток, но пробуждения планировщика и сам запуск задач
+# читают хранилище прямо в цикле событий: таймаут соединения ограничивает, насколько зависший Postgres
+# может заморозить процесс, pre_ping отбрасывает соединения, оборванные за время простоя
+jobstore_url = database_url.replace("+asyncpg", "+psycopg2", 1)
+JOBS_TABLE = "apscheduler_jobs"
+jobstore = SQLAlchemyJobStore(
+    url=jobstore_url,
+    tablename=JOBS_TABLE,
+    engine_options={"connect_args": {"connect_timeout": config.jobstore_connect_timeout}, "pool_pre_ping": True},
+)
+scheduler = AsyncIOScheduler(timezone="UTC", jobstores={"default": jobstore})
 
 
 TLG_PATH = f"/{config.bot_token}"
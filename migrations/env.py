@@ -9,7 +9,7 @@ from alembic import context
 
 sys.path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 
-from create_app import database_url
+from create_app import JOBS_TABLE, database_url
 from models.sql_models import BaseDB, BondDB
 
 
@@ -30,6 +30,12 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = BaseDB.metadata
 
+
+def include_name(name, type_, parent_names) -> bool:
+    # Таблицу задач создаёт и ведёт сам APScheduler
+    return not (type_ == "table" and name == JOBS_TABLE)
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -54,6 +60,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -74,7 +81,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
 
         with context.begin_transaction():
             context.run_migrations()
@@ -1,4 +1,5 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -13,10 +14,10 @@ class DbBondDTO(BaseModel):
 
 class MoexBondDTO(DbBondDTO):
     title: str
-    coupon_date: datetime
+    coupon_date: datetime | None
     coupon_price: int
     nominal: int
-    price: int
+    price: int | None
     redemption_date: datetime
 
 
@@ -26,3 +27,101 @@ class MoneyBalanceDTO(BaseModel):
     currency: str
     created_at: datetime
     description: str
+
+
+class LedgerSummaryDTO(BaseModel):
+    balance: int
+    deposits: int
+    by_category: dict[str, int]
+    by_month: dict[date, int]
+
+
+class BondQuoteDTO(BaseModel):
+    isin: str
+    title: str
+    face_value: float
+    price: float | None
+    accrued_int: float
+    coupon_value: float | None
+    coupon_date: date | None
+    maturity_date: date | None
+    buyback_date: date | None
+    coupon_period: int
+    turnover: float
+    lot_size: int | None = None
+    issuer: str | None = None
+
+
+class BondEventDTO(BaseModel):
+    isin: str
+    event_date: date
+    kind: str
+    value: float | None
+
+
+class MarketEventDTO(BaseModel):
+    isin: str
+    kind: Literal["amortization", "coupon_value", "coupon_date", "offer", "maturity"]
+    old: int | float | date | None
+    new: int | float | date | None
+
+
+class DohodItem(BaseModel):
+    isin: str
+    price: int
+    price_return: int
+    amount: int = 0
+    issuer: str | None = None
+    lot: int = 1
+    liquidity: float | None = None
+
+
+class BondAnalyticsDTO(BaseModel):
+    isin: str
+    amount: int
+    price: float
+    accrued_int: float
+    ytm: float | None
+    macaulay_duration: float | None
+    modified_duration: float | None
+    convexity: float | None
+
+
+class PortfolioAnalyticsDTO(BaseModel):
+    bonds: list[BondAnalyticsDTO]
+    price: float
+    ytm: float | None
+    macaulay_duration: float | None
+    modified_duration: float | None
+    convexity: float | None
+
+
+class WarmUpStateDTO(BaseModel):
+    ready: bool
+    finished: bool
+    elapsed: float | None
+    steps: dict[str, str]
+
+
+class UpdateQueueStateDTO(BaseModel):
+    workers: int
+    capacity: int
+    queued: int
+    max_shard_depth: int
+    in_flight: int
+    max_wait: float
+    received: int
+    duplicates: int
+    rejected: int
+    processed: int
+    failed: int
+
+
+class BrokerImportResultDTO(BaseModel):
+    rows: int
+    imported: int
+    duplicates: int
+    invalid: int
+    isins: list[str]
+    unknown_isins: list[str]
+    errors: list[str]
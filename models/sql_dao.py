@@ -1,23 +1,77 @@
 import asyncio
-from typing import List
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date
+from functools import cache
+from typing import AsyncIterator, Iterable, Iterator, List
 
-from sqlalchemy import insert, update, delete, select, func
+from sqlalchemy import Date, Result, Select, String, any_, bindparam, case, cast, insert, update, delete, select, func
+from sqlalchemy import text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.exc import InterfaceError, OperationalError
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 
 from config import config
 from create_app import database_url, logger, bot
-from models.schemas import DbBondDTO, MoneyBalanceDTO
-from models.sql_models import BondDB, MoneyBalanceDB
+from models.schemas import BondEventDTO, BondQuoteDTO, DbBondDTO, LedgerSummaryDTO, MoneyBalanceDTO
+from models.sql_models import (
+    BondDB,
+    BondEventDB,
+    BondHistoryDB,
+    BondQuoteDB,
+    CachedPayloadDB,
+    MoneyBalanceDB,
+    MoneyTotalDB,
+)
 
 engine = create_async_engine(url=database_url)
 
 async_session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
 
+current_session: ContextVar[AsyncSession | None] = ContextVar("current_session", default=None)
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Одна сессия и одна транзакция на блок: вызовы DAO внутри присоединяются к ней,
+    фиксация - при выходе из внешнего блока, при исключении - откат всего блока.
+    """
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+    async with async_session_maker() as session:
+        token = current_session.set(session)
+        try:
+            async with session.begin():
+                yield session
+        finally:
+            current_session.reset(token)
+
+
+@asynccontextmanager
+async def get_session() -> AsyncIterator[AsyncSession]:
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+    async with async_session_maker() as session:
+        yield session
+
+
+async def commit(session: AsyncSession):
+    # Внутри unit of work фиксирует сам unit_of_work
+    if session is not current_session.get():
+        await session.commit()
+
 
 def retry_on_disconnect(max_retries=7, delay=1):
     def decorator(func):
         async def wrapper(*args, **kwargs):
+            if current_session.get() is not None:
+                # Повтор одного шага не спасёт оборванную транзакцию - ошибка уходит наверх, в unit of work
+                return await func(*args, **kwargs)
             retries = 0
             while retries < max_retries:
                 try:
@@ -40,140 +94,486 @@ def retry_on_disconnect(max_retries=7, delay=1):
 
 class BaseDAO:
     model = None
+    dto = None
+    conflict_columns: tuple[str, ...] = ("id",)
+    chunk_size = 1000
+
+    @classmethod
+    @cache
+    def _select(cls) -> Select:
+        """
+        Core select по колонкам DTO - без ORM-сущностей и identity map.
+        Один объект на класс: компиляция берётся из кэша SQLAlchemy, а asyncpg переиспользует prepared statement.
+        """
+        return select(*(cls.model.__table__.c[name] for name in cls.dto.model_fields))
+
+    @classmethod
+    def _isin_in(cls, isins: list[str]):
+        # Один параметр-массив вместо IN ($1..$n): текст запроса и prepared statement не зависят от длины списка
+        return cls.model.isin == any_(bindparam("isins", value=list(isins), type_=ARRAY(String)))
+
+    @classmethod
+    def _to_dtos(cls, result: Result) -> list:
+        """Строки из своей БД уже соответствуют схеме - DTO собираются без валидации."""
+        keys = tuple(result.keys())
+        construct = cls.dto.model_construct
+        return [construct(**dict(zip(keys, row))) for row in result.tuples()]
 
     @classmethod
     @retry_on_disconnect()
     async def create_many(cls, data: List[dict]):
-        async with async_session_maker() as session:
+        async with get_session() as session:
             stmt = insert(cls.model).values(data)
             await session.execute(stmt)
-            await session.commit()
+            await commit(session)
+
+    @classmethod
+    def _conflict_set(cls, stmt, keys: Iterable[str], increment: tuple[str, ...]) -> dict:
+        table = cls.model.__table__
+        return {
+            key: table.c[key] + stmt.excluded[key] if key in increment else stmt.excluded[key]
+            for key in keys
+            if key not in cls.conflict_columns
+        }
+
+    @classmethod
+    def _upsert_statements(cls, data: list[dict], increment: tuple[str, ...] = ()) -> Iterator:
+        # Один ключ конфликта не должен повторяться внутри пачки - Postgres не обновит строку дважды
+        for i in range(0, len(data), cls.chunk_size):
+            stmt = pg_insert(cls.model).values(data[i : i + cls.chunk_size])
+            yield stmt.on_conflict_do_update(
+                index_elements=list(cls.conflict_columns),
+                set_=cls._conflict_set(stmt=stmt, keys=data[i].keys(), increment=increment),
+            )
+
+    @classmethod
+    @retry_on_disconnect()
+    async def upsert_many(cls, data: list[dict], increment: tuple[str, ...] = ()):
+        """INSERT ... ON CONFLICT DO UPDATE пачками по chunk_size; колонки из increment прибавляются к текущим."""
+        async with get_session() as session:
+            for stmt in cls._upsert_statements(data=data, increment=increment):
+                await session.execute(stmt)
+            await commit(session)
 
     @classmethod
     @retry_on_disconnect()
     async def create_with_return_id(cls, **data) -> int:
-        async with async_session_maker() as session:
+        async with get_session() as session:
             stmt = insert(cls.model).values(**data).returning(cls.model.id)
             result = await session.execute(stmt)
             created_id = result.scalar()
-            await session.commit()
+            await commit(session)
             return created_id
 
     @classmethod
     @retry_on_disconnect()
     async def update_by_id(cls, item_id: int, **data):
-        async with async_session_maker() as session:
+        async with get_session() as session:
             stmt = update(cls.model).values(**data).filter_by(id=item_id)
             await session.execute(stmt)
-            await session.commit()
+            await commit(session)
 
     @classmethod
     @retry_on_disconnect()
     async def delete(cls, **data):
-        async with async_session_maker() as session:
+        async with get_session() as session:
             stmt = delete(cls.model).filter_by(**data)
             await session.execute(stmt)
-            await session.commit()
+            await commit(session)
 
     @classmethod
     @retry_on_disconnect()
     async def delete_many_by_ids(cls, ids: list[int]):
-        async with async_session_maker() as session:
+        async with get_session() as session:
             stmt = delete(cls.model).where(cls.model.id.in_(ids))
             await session.execute(stmt)
-            await session.commit()
+            await commit(session)
 
 
 class BondsDAO(BaseDAO):
     model = BondDB
+    dto = DbBondDTO
+    conflict_columns = ("isin",)
 
     @classmethod
     @retry_on_disconnect()
     async def get_one_or_none(cls, **filter_by) -> DbBondDTO | None:
-        async with async_session_maker() as session:
-            query = select(cls.model).filter_by(**filter_by).limit(1)
+        async with get_session() as session:
+            query = cls._select().filter_by(**filter_by).limit(1)
             result = await session.execute(query)
-            row = result.scalars().one_or_none()
-            if row:
-                return DbBondDTO.model_validate(obj=row, from_attributes=True)
+            return next(iter(cls._to_dtos(result=result)), None)
 
     @classmethod
     @retry_on_disconnect()
     async def get_many(cls, **filter_by) -> list[DbBondDTO]:
-        async with async_session_maker() as session:
-            query = select(cls.model).filter_by(**filter_by)
-            data = await session.execute(query)
-            return [DbBondDTO.model_validate(obj=row, from_attributes=True) for row in data.scalars().all()]
+        async with get_session() as session:
+            query = cls._select().filter_by(**filter_by)
+            return cls._to_dtos(result=await session.execute(query))
 
 
 class MoneyBalanceDAO(BaseDAO):
     model = MoneyBalanceDB
+    dto = MoneyBalanceDTO
 
     @classmethod
     @retry_on_disconnect()
     async def get_one_or_none(cls, currency: str = "RUB") -> MoneyBalanceDTO | None:
-        async with async_session_maker() as session:
-            query = select(cls.model).filter_by(currency=currency).limit(1)
+        async with get_session() as session:
+            query = cls._select().filter_by(currency=currency).limit(1)
             result = await session.execute(query)
-            row = result.scalars().one_or_none()
-            if row:
-                return MoneyBalanceDTO.model_validate(obj=row, from_attributes=True)
+            return next(iter(cls._to_dtos(result=result)), None)
 
     @classmethod
     @retry_on_disconnect()
     async def get_many(cls, **filter_by) -> list[MoneyBalanceDTO]:
-        async with async_session_maker() as session:
-            query = select(cls.model).filter_by(**filter_by)
-            data = await session.execute(query)
-            return [MoneyBalanceDTO.model_validate(obj=row, from_attributes=True) for row in data.scalars().all()]
+        async with get_session() as session:
+            query = cls._select().filter_by(**filter_by)
+            return cls._to_dtos(result=await session.execute(query))
 
     @classmethod
     @retry_on_disconnect()
-    async def get_total(cls, **filter_by) -> int:
-        async with async_session_maker() as session:
-            query = select(func.sum(cls.model.amount)).filter_by(**filter_by)
-            result = await session.execute(query)
+    async def get_total(cls, currency: str = "RUB") -> int:
+        """Остаток из money_totals - одна строка вместо суммы по всему журналу."""
+        async with get_session() as session:
+            result = await session.execute(select(MoneyTotalDB.amount).filter_by(currency=currency))
+            return result.scalar() or 0
+
+    @classmethod
+    async def lock_total(cls, currency: str = "RUB") -> int:
+        """
+        Остаток с блокировкой строки money_totals до конца транзакции - только внутри unit_of_work.
+        Списания проверяют остаток через неё, поэтому параллельные пополнения, выводы и покупки идут по очереди.
+        """
+        async with get_session() as session:
+            result = await session.execute(select(MoneyTotalDB.amount).filter_by(currency=currency).with_for_update())
             return result.scalar() or 0
 
+    @classmethod
+    @retry_on_disconnect()
+    async def get_summary(cls, currency: str = "RUB") -> LedgerSummaryDTO:
+        """Остаток, пополнения и разбивки по категории и месяцу - один GROUPING SETS запрос."""
+        # Категория - первое слово описания: deposit, buy, coupon_payment, part_redemption, bond_redemption
+        ledger = (
+            select(
+                func.split_part(cls.model.description, " ", 1).label("category"),
+                cast(func.date_trunc("month", cls.model.created_at), Date).label("month"),
+                cls.model.amount,
+            )
+            .filter_by(currency=currency)
+            .subquery()
+        )
+        category, month = ledger.c.category, ledger.c.month
+        query = select(
+            func.grouping(category), func.grouping(month), category, month, func.sum(ledger.c.amount)
+        ).group_by(func.grouping_sets(tuple_(), tuple_(category), tuple_(month)))
+        async with get_session() as session:
+            result = await session.execute(query)
+            rows = result.all()
+        summary = LedgerSummaryDTO(balance=0, deposits=0, by_category={}, by_month={})
+        for no_category, no_month, category_value, month_value, amount in rows:
+            if no_category and no_month:
+                summary.balance = amount or 0
+            elif no_month:
+                summary.by_category[category_value] = amount
+            else:
+                summary.by_month[month_value] = amount
+        summary.deposits = summary.by_category.get("deposit", 0)
+        summary.by_month = dict(sorted(summary.by_month.items()))
+        return summary
+
+
+class MoneyTotalsDAO(BaseDAO):
+    model = MoneyTotalDB
+
+    @classmethod
+    @retry_on_disconnect()
+    async def audit(cls) -> list[tuple[str, int, int]]:
+        """Расхождения money_totals с полной суммой журнала: (валюта, остаток, сумма)."""
+        async with get_session() as session:
+            ledger = (
+                select(MoneyBalanceDB.currency, func.sum(MoneyBalanceDB.amount).label("amount"))
+                .group_by(MoneyBalanceDB.currency)
+                .subquery()
+            )
+            query = (
+                select(
+                    func.coalesce(cls.model.currency, ledger.c.currency),
+                    func.coalesce(cls.model.amount, 0),
+                    func.coalesce(ledger.c.amount, 0),
+                )
+                .select_from(cls.model)
+                .join(ledger, ledger.c.currency == cls.model.currency, full=True)
+                .where(func.coalesce(cls.model.amount, 0) != func.coalesce(ledger.c.amount, 0))
+            )
+            result = await session.execute(query)
+            return [tuple(row) for row in result.all()]
+
+    @classmethod
+    @retry_on_disconnect()
+    async def rebuild(cls):
+        async with get_session() as session:
+            await session.execute(text(f"LOCK TABLE {MoneyBalanceDB.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+            await session.execute(delete(cls.model))
+            ledger = select(MoneyBalanceDB.currency, func.sum(MoneyBalanceDB.amount)).group_by(MoneyBalanceDB.currency)
+            await session.execute(insert(cls.model).from_select(["currency", "amount"], ledger))
+            await commit(session)
+
+
+class BondQuotesDAO(BaseDAO):
+    model = BondQuoteDB
+    dto = BondQuoteDTO
+    conflict_columns = ("isin",)
+
+    @classmethod
+    @retry_on_disconnect()
+    async def get_many(cls, isins: list[str] | None = None) -> list[BondQuoteDTO]:
+        async with get_session() as session:
+            query = cls._select()
+            if isins is not None:
+                query = query.where(cls._isin_in(isins=isins))
+            return cls._to_dtos(result=await session.execute(query))
+
+    @classmethod
+    @retry_on_disconnect()
+    async def set_issuers(cls, issuers: dict[str, str]) -> int:
+        """Проставляет emitent_id бумагам, которые уже есть в bond_quotes; возвращает число изменённых строк."""
+        table = cls.model.__table__
+        stmt = (
+            update(table)
+            .where(table.c.isin == bindparam("quote_isin"), table.c.issuer.is_distinct_from(bindparam("quote_issuer")))
+            .values(issuer=bindparam("quote_issuer"))
+        )
+        async with get_session() as session:
+            known = set((await session.execute(select(table.c.isin).where(cls._isin_in(isins=issuers)))).scalars())
+            data = [{"quote_isin": isin, "quote_issuer": issuers[isin]} for isin in known]
+            if data:
+                await session.execute(stmt, data)
+            await commit(session)
+            return len(data)
+
+    @classmethod
+    def _conflict_set(cls, stmt, keys: Iterable[str], increment: tuple[str, ...]) -> dict:
+        columns = super()._conflict_set(stmt=stmt, keys=keys, increment=increment)
+        # До начала торгов VALTODAY нулевой - оставляем последний ненулевой оборот
+        columns["turnover"] = case((stmt.excluded.turnover > 0, stmt.excluded.turnover), else_=cls.model.turnover)
+        return {**columns, "updated_at": text("TIMEZONE('utc', now())")}
+
+
+class BondHistoryDAO(BaseDAO):
+    model = BondHistoryDB
+    columns = ("isin", "trade_date", "close", "waprice", "yield_close", "accrued_int", "volume", "value")
+
+    @classmethod
+    @retry_on_disconnect()
+    async def get_isins(cls) -> list[str]:
+        async with get_session() as session:
+            result = await session.execute(select(cls.model.isin).distinct())
+            return list(result.scalars().all())
+
+    @classmethod
+    @retry_on_disconnect()
+    async def get_last_dates(cls, isins: list[str]) -> dict[str, date]:
+        async with get_session() as session:
+            query = (
+                select(cls.model.isin, func.max(cls.model.trade_date))
+                .where(cls.model.isin.in_(isins))
+                .group_by(cls.model.isin)
+            )
+            result = await session.execute(query)
+            return dict(result.all())
+
+    @classmethod
+    @retry_on_disconnect()
+    async def copy_many(cls, records: list[tuple]):
+        """COPY во временную таблицу и перенос без дублей по (isin, trade_date)."""
+        table = cls.model.__tablename__
+        async with get_session() as session:
+            await session.execute(
+                text(f"CREATE TEMP TABLE {table}_staging (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            )
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                f"{table}_staging", records=records, columns=cls.columns
+            )
+            await session.execute(text(f"INSERT INTO {table} SELECT * FROM {table}_staging ON CONFLICT DO NOTHING"))
+            await commit(session)
+
+
+class BondEventsDAO(BaseDAO):
+    model = BondEventDB
+    dto = BondEventDTO
+
+    @classmethod
+    @retry_on_disconnect()
+    async def get_many(cls, isins: list[str]) -> list[BondEventDTO]:
+        async with get_session() as session:
+            query = (
+                cls._select()
+                .where(cls._isin_in(isins=isins))
+                .order_by(cls.model.isin, cls.model.event_date, cls.model.kind)
+            )
+            return cls._to_dtos(result=await session.execute(query))
+
+    @classmethod
+    @retry_on_disconnect()
+    async def replace(cls, isin: str, data: list[dict]):
+        async with get_session() as session:
+            await session.execute(delete(cls.model).filter_by(isin=isin))
+            if data:
+                await session.execute(insert(cls.model).values(data))
+            await commit(session)
+
+
+class CachedPayloadsDAO(BaseDAO):
+    model = CachedPayloadDB
+
+    @classmethod
+    @retry_on_disconnect()
+    async def get(cls, key: str) -> list | dict | None:
+        async with get_session() as session:
+            result = await session.execute(select(cls.model.payload).filter_by(key=key))
+            return result.scalar_one_or_none()
+
+    @classmethod
+    @retry_on_disconnect()
+    async def save(cls, key: str, payload: list | dict):
+        async with get_session() as session:
+            stmt = pg_insert(cls.model).values(key=key, payload=payload)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.model.key],
+                set_={"payload": stmt.excluded.payload, "updated_at": text("TIMEZONE('utc', now())")},
+            )
+            await session.execute(stmt)
+            await commit(session)
+
 
 class TransactionsDAO:
 
     @staticmethod
     @retry_on_disconnect()
-    async def create_bond(isin: str, amount: int, nominal: int, price: int, coupon: int) -> bool:
-        async with async_session_maker() as session:
-            balance_query = select(func.sum(MoneyBalanceDB.amount)).where(MoneyBalanceDB.currency == "RUB")
-            result = await session.execute(balance_query)
-            total_balance = result.scalar() or 0
-            if total_balance < price:
+    async def buy_bonds(bonds: list[dict]) -> bool:
+        """
+        Покупка пачки бумаг одной транзакцией: одна проверка остатка на общую сумму, списание по каждой бумаге
+        и позиции одним upsert по уникальному isin (новая бумага и докупка - один путь).
+        bonds: [{"isin", "amount", "price", "nominal", "coupon"}], isin в пачке не повторяются.
+        """
+        async with unit_of_work() as session:
+            total_balance = await MoneyBalanceDAO.lock_total()
+            if total_balance < sum(bond["price"] for bond in bonds):
                 return False
-            balance_stmt = insert(MoneyBalanceDB).values(amount=-price, description="buy bond")
-            await session.execute(balance_stmt)
-            bond_stmt = insert(BondDB).values(isin=isin, amount=amount, cur_nominal=nominal, cur_coupon=coupon)
-            await session.execute(bond_stmt)
-            await session.commit()
+            balances = [{"amount": -bond["price"], "description": "buy bond"} for bond in bonds]
+            await session.execute(insert(MoneyBalanceDB), balances)
+            data = [
+                {
+                    "isin": bond["isin"],
+                    "amount": bond["amount"],
+                    "cur_nominal": bond["nominal"],
+                    "cur_coupon": bond["coupon"],
+                }
+                for bond in bonds
+            ]
+            for stmt in BondsDAO._upsert_statements(data=data, increment=("amount", "cur_nominal", "cur_coupon")):
+                await session.execute(stmt)
             return True
 
     @staticmethod
     @retry_on_disconnect()
-    async def update_bond(isin: str, amount: int, price: int, nominal: int, coupon: int) -> bool:
-        async with async_session_maker() as session:
-            balance_query = select(func.sum(MoneyBalanceDB.amount)).where(MoneyBalanceDB.currency == "RUB")
-            result = await session.execute(balance_query)
-            total_balance = result.scalar() or 0
-            if total_balance < price:
-                return False
-            balance_stmt = insert(MoneyBalanceDB).values(amount=-price, description="buy bond")
-            await session.execute(balance_stmt)
-            bond_stmt = (
-                update(BondDB)
-                .values(
-                    amount=amount + BondDB.amount,
-                    cur_nominal=nominal + BondDB.cur_nominal,
-                    cur_coupon=BondDB.cur_coupon + coupon,
+    async def settle(balances: list[dict], bonds: list[dict], redeemed: list[str]):
+        """Все проводки и изменения бумаг за расчётный день - одной транзакцией."""
+        async with get_session() as session:
+            await session.execute(insert(MoneyBalanceDB), balances)
+            if bonds:
+                await session.execute(update(BondDB), bonds)
+            if redeemed:
+                await session.execute(delete(BondDB).where(BondDB.isin.in_(redeemed)))
+            await commit(session)
+
+
+class BrokerImportDAO:
+    """
+    Загрузка отчёта брокера: COPY пачками во временную таблицу и один set-based перенос в bonds и money_balances.
+    Таблица живёт до конца транзакции, поэтому все вызовы - внутри одного unit_of_work.
+    """
+
+    table = "broker_import_staging"
+    columns = ("created_at", "description", "amount", "isin", "quantity")
+
+    @classmethod
+    async def create_staging(cls):
+        async with get_session() as session:
+            await session.execute(
+                text(
+                    f"CREATE TEMP TABLE {cls.table} (created_at timestamp NOT NULL, description varchar NOT NULL, "
+                    f"amount bigint NOT NULL, isin varchar, quantity integer) ON COMMIT DROP"
                 )
-                .filter_by(isin=isin)
             )
-            await session.execute(bond_stmt)
-            await session.commit()
-            return True
+
+    @classmethod
+    async def copy_many(cls, records: list[tuple]):
+        async with get_session() as session:
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                cls.table, records=records, columns=cls.columns
+            )
+
+    @classmethod
+    async def merge(cls) -> dict[str, int | list[str]]:
+        """Переносит staging в журнал и позиции; возвращает неизвестные ISIN и число пропущенных повторов."""
+        async with get_session() as session:
+            # Сделки по бумагам без котировки не проводим: не из чего взять номинал и купон
+            result = await session.execute(
+                text(
+                    f"DELETE FROM {cls.table} s WHERE s.isin IS NOT NULL "
+                    f"AND NOT EXISTS (SELECT 1 FROM bond_quotes q WHERE q.isin = s.isin) RETURNING s.isin"
+                )
+            )
+            unknown = sorted(set(result.scalars().all()))
+            # Повторный импорт того же отчёта: строки, уже проведённые в журнале, пропускаем
+            result = await session.execute(
+                text(
+                    f"DELETE FROM {cls.table} s USING money_balances m WHERE m.currency = 'RUB' "
+                    f"AND m.created_at = s.created_at AND m.description = s.description AND m.amount = s.amount"
+                )
+            )
+            duplicates = result.rowcount
+            result = await session.execute(
+                text(
+                    f"INSERT INTO money_balances (created_at, description, amount) "
+                    f"SELECT created_at, description, amount FROM {cls.table}"
+                )
+            )
+            imported = result.rowcount
+            await session.execute(
+                text(
+                    f"""
+                    WITH trades AS (
+                        SELECT isin, SUM(quantity) AS quantity FROM {cls.table}
+                        WHERE isin IS NOT NULL GROUP BY isin
+                    ),
+                    -- Номинал и купон - как в services.moex (position_nominal, MoexSnapshot.get_bond):
+                    -- дробная часть номинала отбрасывается, иначе детектор увидит ложную амортизацию
+                    positions AS (
+                        SELECT t.isin, t.quantity,
+                               trunc(q.face_value)::bigint * t.quantity * 100 AS nominal,
+                               trunc(COALESCE(q.coupon_value, 0) * t.quantity * 100)::bigint AS coupon
+                        FROM trades t JOIN bond_quotes q ON q.isin = t.isin
+                    )
+                    INSERT INTO bonds (isin, amount, cur_nominal, cur_coupon)
+                    SELECT isin, quantity, nominal, coupon FROM positions
+                    ON CONFLICT (isin) DO UPDATE
+                    SET amount = bonds.amount + EXCLUDED.amount,
+                        cur_nominal = bonds.cur_nominal + EXCLUDED.cur_nominal,
+                        cur_coupon = bonds.cur_coupon + EXCLUDED.cur_coupon
+                    """
+                )
+            )
+            # Проданные целиком позиции закрываем
+            await session.execute(
+                text(
+                    f"DELETE FROM bonds WHERE amount <= 0 "
+                    f"AND isin IN (SELECT isin FROM {cls.table} WHERE isin IS NOT NULL)"
+                )
+            )
+            return {"imported": imported, "duplicates": duplicates, "unknown": unknown}
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Annotated
 
-from sqlalchemy import MetaData, text
+from sqlalchemy import JSON, BigInteger, Index, MetaData, text
 from sqlalchemy.orm import Mapped, mapped_column, as_declarative
 
 intpk = Annotated[int, mapped_column(primary_key=True)]
@@ -18,7 +18,7 @@ class BondDB(BaseDB):
     __tablename__ = "bonds"
 
     id: Mapped[intpk]
-    isin: Mapped[str_200]
+    isin: Mapped[str_200] = mapped_column(index=True, unique=True)
     amount: Mapped[int]
     cur_coupon: Mapped[int] = mapped_column(server_default="0")
     cur_nominal: Mapped[int]
@@ -26,9 +26,69 @@ class BondDB(BaseDB):
 
 class MoneyBalanceDB(BaseDB):
     __tablename__ = "money_balances"
+    __table_args__ = (Index("ix_money_balances_currency_created_at", "currency", "created_at"),)
 
     id: Mapped[intpk]
     created_at: Mapped[created_at]
-    description: Mapped[str_200]
+    description: Mapped[str_200] = mapped_column(index=True)
     amount: Mapped[int] = mapped_column(server_default="0")
     currency: Mapped[str_200] = mapped_column(server_default="RUB")
+
+
+class BondQuoteDB(BaseDB):
+    __tablename__ = "bond_quotes"
+
+    isin: Mapped[str_200] = mapped_column(primary_key=True)
+    title: Mapped[str_200]
+    face_value: Mapped[float]
+    price: Mapped[float | None]
+    accrued_int: Mapped[float]
+    coupon_value: Mapped[float | None]
+    coupon_date: Mapped[date | None]
+    maturity_date: Mapped[date | None]
+    buyback_date: Mapped[date | None]
+    coupon_period: Mapped[int] = mapped_column(server_default="0")
+    turnover: Mapped[float] = mapped_column(server_default="0")
+    lot_size: Mapped[int | None]
+    issuer: Mapped[str_200 | None]
+    updated_at: Mapped[created_at]
+
+
+class BondHistoryDB(BaseDB):
+    __tablename__ = "bond_history"
+
+    isin: Mapped[str_200] = mapped_column(primary_key=True)
+    trade_date: Mapped[date] = mapped_column(primary_key=True)
+    close: Mapped[float | None]
+    waprice: Mapped[float | None]
+    yield_close: Mapped[float | None]
+    accrued_int: Mapped[float | None]
+    volume: Mapped[int] = mapped_column(BigInteger, server_default="0")
+    value: Mapped[float] = mapped_column(server_default="0")
+
+
+class BondEventDB(BaseDB):
+    __tablename__ = "bond_events"
+
+    isin: Mapped[str_200] = mapped_column(primary_key=True)
+    event_date: Mapped[date] = mapped_column(primary_key=True)
+    kind: Mapped[str_200] = mapped_column(primary_key=True)
+    value: Mapped[float | None]
+
+
+class CachedPayloadDB(BaseDB):
+    __tablename__ = "cached_payloads"
+
+    key: Mapped[str_200] = mapped_column(primary_key=True)
+    payload: Mapped[list | dict] = mapped_column(JSON)
+    updated_at: Mapped[created_at]
+
+
+class MoneyTotalDB(BaseDB):
+    """Текущий остаток по валюте; ведётся триггером на money_balances."""
+
+    __tablename__ = "money_totals"
+
+    currency: Mapped[str_200] = mapped_column(primary_key=True)
+    amount: Mapped[int] = mapped_column(BigInteger, server_default="0")
+    updated_at: Mapped[created_at]
@@ -0,0 +1,207 @@
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+from models.schemas import BondAnalyticsDTO, DbBondDTO, PortfolioAnalyticsDTO
+from services.moex import MoexRow, MoexSnapshot, parse_date, parse_float
+
+DAYS_IN_YEAR = 365
+
+
+class CashFlows(NamedTuple):
+    # (бумаги x платежи); лишние ячейки дополнены нулевыми платежами
+    times: np.ndarray
+    flows: np.ndarray
+
+
+class RiskMeasures(NamedTuple):
+    ytm: np.ndarray
+    macaulay_duration: np.ndarray
+    modified_duration: np.ndarray
+    convexity: np.ndarray
+
+
+class BondAnalytics:
+    """
+    Доходность к погашению/оферте, дюрация и выпуклость сразу для массива бумаг.
+    Все величины считаются на одну бумагу, в рублях, с годовым начислением.
+    """
+
+    @staticmethod
+    def prices(rows: list[MoexRow]) -> np.ndarray:
+        """Грязная цена одной бумаги: PREVWAPRICE в % от номинала плюс НКД."""
+        face = np.array([parse_float(row.facevalue) or np.nan for row in rows], dtype=float)
+        price = np.array([parse_float(row.prevwaprice) or np.nan for row in rows], dtype=float)
+        accrued = np.array([parse_float(row.accruedint) or 0 for row in rows], dtype=float)
+        return face * price / 100 + accrued
+
+    @staticmethod
+    def estimate_cash_flows(rows: list[MoexRow], today: date) -> CashFlows:
+        """
+        Оценка графика по снимку доски: текущий купон каждые COUPONPERIOD дней
+        от NEXTCOUPON до оферты/погашения, номинал - в дату оферты/погашения.
+        """
+        n = len(rows)
+        face = np.zeros(n)
+        coupon = np.zeros(n)
+        next_days = np.zeros(n, dtype=np.int64)
+        end_days = np.zeros(n, dtype=np.int64)
+        period = np.zeros(n, dtype=np.int64)
+        for i, row in enumerate(rows):
+            redemption_date = parse_date(row.buybackdate) or parse_date(row.matdate)
+            coupon_date = parse_date(row.nextcoupon) or redemption_date
+            if redemption_date is None or redemption_date < today:
+                continue
+            face[i] = parse_float(row.facevalue) or 0
+            coupon[i] = parse_float(row.couponvalue) or 0
+            next_days[i] = (coupon_date - today).days
+            end_days[i] = (redemption_date - today).days
+            period[i] = int(parse_float(row.couponperiod) or 0)
+        has_coupons = (period > 0) & (coupon > 0) & (next_days <= end_days)
+        counts = np.where(has_coupons, (end_days - next_days) // np.maximum(period, 1) + 1, 0)
+        offsets = np.arange(max(int(counts.max(initial=0)), 1))
+        coupon_days = next_days[:, None] + offsets[None, :] * period[:, None]
+        coupon_flows = np.where(offsets[None, :] < counts[:, None], coupon[:, None], 0.0)
+        times = np.hstack([coupon_days, end_days[:, None]]) / DAYS_IN_YEAR
+        flows = np.hstack([coupon_flows, face[:, None]])
+        return CashFlows(times=times, flows=flows)
+
+    @staticmethod
+    def from_schedules(schedules: list[list[tuple[date, float]]], today: date) -> CashFlows:
+        """Точные графики (дата, сумма на бумагу) произвольной длины -> дополненные матрицы."""
+        width = max((len(schedule) for schedule in schedules), default=0) or 1
+        times = np.zeros((len(schedules), width))
+        flows = np.zeros((len(schedules), width))
+        for i, schedule in enumerate(schedules):
+            future = [(event_date, value) for event_date, value in schedule if event_date >= today]
+            if future:
+                times[i, : len(future)] = [(event_date - today).days / DAYS_IN_YEAR for event_date, _ in future]
+                flows[i, : len(future)] = [value for _, value in future]
+        return CashFlows(times=times, flows=flows)
+
+    @classmethod
+    def combine_cash_flows(
+        cls, rows: list[MoexRow], schedules: list[list[tuple[date, float]] | None], today: date
+    ) -> CashFlows:
+        """Точный график там, где он есть, для остальных бумаг - оценка по снимку."""
+        estimated = cls.estimate_cash_flows(rows=rows, today=today)
+        exact_indexes = [i for i, schedule in enumerate(schedules) if schedule]
+        if not exact_indexes:
+            return estimated
+        exact = cls.from_schedules(schedules=[schedules[i] for i in exact_indexes], today=today)
+        width = max(estimated.times.shape[1], exact.times.shape[1])
+        times = np.zeros((len(rows), width))
+        flows = np.zeros((len(rows), width))
+        times[:, : estimated.times.shape[1]] = estimated.times
+        flows[:, : estimated.flows.shape[1]] = estimated.flows
+        times[exact_indexes] = 0
+        flows[exact_indexes] = 0
+        times[exact_indexes, : exact.times.shape[1]] = exact.times
+        flows[exact_indexes, : exact.flows.shape[1]] = exact.flows
+        return CashFlows(times=times, flows=flows)
+
+    @staticmethod
+    def solve_ytm(cash_flows: CashFlows, prices: np.ndarray, iterations: int = 50, tol: float = 1e-10) -> np.ndarray:
+        """Метод Ньютона по всем бумагам одновременно: sum(cf * (1 + y) ** -t) = price."""
+        times, flows = cash_flows
+        valid = np.isfinite(prices) & (prices > 0) & (flows.sum(axis=1) > 0)
+        ytm = np.full(len(prices), 0.1)
+        active = valid.copy()
+        with np.errstate(all="ignore"):
+            for _ in range(iterations):
+                if not active.any():
+                    break
+                t, cf, y = times[active], flows[active], ytm[active]
+                discount = np.exp(-t * np.log1p(y)[:, None])
+                value = (cf * discount).sum(axis=1) - prices[active]
+                derivative = -(t * cf * discount).sum(axis=1) / (1 + y)
+                step = value / derivative
+                y = np.maximum(y - step, -0.99)
+                ytm[active] = y
+                done = np.abs(step) < tol
+                active[np.flatnonzero(active)[done]] = False
+        ytm[~valid] = np.nan
+        return ytm
+
+    @classmethod
+    def risk_measures(cls, cash_flows: CashFlows, prices: np.ndarray) -> RiskMeasures:
+        times, flows = cash_flows
+        ytm = cls.solve_ytm(cash_flows=cash_flows, prices=prices)
+        with np.errstate(all="ignore"):
+            discount = np.exp(-times * np.log1p(ytm)[:, None])
+            present_value = flows * discount
+            total = present_value.sum(axis=1)
+            macaulay = (times * present_value).sum(axis=1) / total
+            modified = macaulay / (1 + ytm)
+            convexity = (times * (times + 1) * present_value).sum(axis=1) / (total * (1 + ytm) ** 2)
+        return RiskMeasures(ytm=ytm, macaulay_duration=macaulay, modified_duration=modified, convexity=convexity)
+
+    @staticmethod
+    def __to_list(values: np.ndarray) -> list[float | None]:
+        return [None if value != value else value for value in np.round(values, 6).tolist()]
+
+    @classmethod
+    def portfolio(
+        cls, rows: list[MoexRow], amounts: list[int], today: date, cash_flows: CashFlows | None = None
+    ) -> PortfolioAnalyticsDTO:
+        if cash_flows is None:
+            cash_flows = cls.estimate_cash_flows(rows=rows, today=today)
+        prices = cls.prices(rows=rows)
+        bonds = cls.risk_measures(cash_flows=cash_flows, prices=prices)
+        # Портфель - один поток платежей из всех бумаг с весами по количеству
+        weights = np.array(amounts, dtype=float)
+        held = np.isfinite(prices)
+        portfolio_flows = CashFlows(
+            times=cash_flows.times[held].reshape(1, -1),
+            flows=(cash_flows.flows[held] * weights[held, None]).reshape(1, -1),
+        )
+        portfolio_price = np.array([(prices[held] * weights[held]).sum()])
+        portfolio = cls.risk_measures(cash_flows=portfolio_flows, prices=portfolio_price)
+        columns = zip(
+            rows,
+            amounts,
+            np.nan_to_num(prices).tolist(),
+            *(cls.__to_list(values) for values in bonds),
+        )
+        portfolio = [cls.__to_list(values)[0] for values in portfolio]
+        return PortfolioAnalyticsDTO(
+            bonds=[
+                BondAnalyticsDTO(
+                    isin=row.secid,
+                    amount=amount,
+                    price=round(price, 2),
+                    accrued_int=parse_float(row.accruedint) or 0,
+                    ytm=ytm,
+                    macaulay_duration=macaulay_duration,
+                    modified_duration=modified_duration,
+                    convexity=convexity,
+                )
+                for row, amount, price, ytm, macaulay_duration, modified_duration, convexity in columns
+            ],
+            price=round(float(portfolio_price[0]), 2),
+            ytm=portfolio[0],
+            macaulay_duration=portfolio[1],
+            modified_duration=portfolio[2],
+            convexity=portfolio[3],
+        )
+
+    @classmethod
+    def for_bonds(
+        cls,
+        sql_bonds: list[DbBondDTO],
+        snapshot: MoexSnapshot,
+        schedules: dict[str, list[tuple[date, float]]] | None = None,
+    ) -> PortfolioAnalyticsDTO:
+        today = date.today()
+        sql_bonds = [sql_bond for sql_bond in sql_bonds if sql_bond.isin in snapshot]
+        rows = [snapshot.rows[sql_bond.isin] for sql_bond in sql_bonds]
+        schedules = schedules or {}
+        return cls.portfolio(
+            rows=rows,
+            amounts=[sql_bond.amount for sql_bond in sql_bonds],
+            today=today,
+            cash_flows=cls.combine_cash_flows(
+                rows=rows, schedules=[schedules.get(row.secid) for row in rows], today=today
+            ),
+        )
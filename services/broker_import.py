@@ -0,0 +1,133 @@
+import asyncio
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Iterable, Iterator
+
+from create_app import logger
+from models.schemas import BrokerImportResultDTO
+from models.sql_dao import BrokerImportDAO, unit_of_work
+from services.quotes import QuotesService
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M:%S")
+
+
+class BrokerImport:
+    """
+    Импорт отчёта брокера в CSV с колонками date, operation, isin, quantity, amount.
+    Операции: buy/sell - сделки (amount - сумма сделки), deposit/withdrawal - ввод и вывод денег,
+    coupon - купон по isin. Суммы в рублях.
+    """
+
+    batch_size = 5000
+    max_errors = 20
+
+    @staticmethod
+    def read_rows(lines: Iterable[str]) -> Iterator[tuple[int, dict]]:
+        lines = iter(lines)
+        header = next(lines, "")
+        try:
+            dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(lines, fieldnames=next(csv.reader([header], dialect=dialect)), dialect=dialect)
+        for line, row in enumerate(reader, start=2):
+            yield line, row
+
+    @staticmethod
+    def __parse_date(value: str) -> datetime:
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+        raise ValueError(f"дата {value!r} не распознана")
+
+    @staticmethod
+    def __parse_amount(value: str) -> int:
+        return int(abs(Decimal(value.replace(" ", "").replace("\xa0", "").replace(",", "."))) * 100)
+
+    @classmethod
+    def __to_record(cls, row: dict) -> tuple:
+        row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+        created_at = cls.__parse_date(row["date"])
+        operation = row["operation"].lower()
+        isin = row.get("isin", "").upper()
+        amount = cls.__parse_amount(row["amount"])
+        if operation in ("buy", "sell"):
+            quantity = int(row["quantity"])
+            if not isin or quantity <= 0:
+                raise ValueError("для сделки нужны ISIN и положительное количество")
+            if operation == "buy":
+                return created_at, f"buy bond {isin}", -amount, isin, quantity
+            return created_at, f"sell bond {isin}", amount, isin, -quantity
+        if operation == "coupon":
+            return created_at, f"coupon_payment {isin}", amount, None, None
+        if operation == "deposit":
+            return created_at, "deposit", amount, None, None
+        if operation == "withdrawal":
+            return created_at, "deposit", -amount, None, None
+        raise ValueError(f"неизвестная операция {operation!r}")
+
+    @classmethod
+    def validate(cls, batch: list[tuple[int, dict]]) -> tuple[list[tuple], list[str]]:
+        records, errors = [], []
+        for line, row in batch:
+            try:
+                records.append(cls.__to_record(row=row))
+            except (KeyError, ValueError, InvalidOperation) as ex:
+                errors.append(f"строка {line}: {ex}")
+        return records, errors
+
+    @classmethod
+    async def run(cls, lines: Iterable[str]) -> BrokerImportResultDTO:
+        """Потоковый импорт: пачки валидируются и уходят COPY в staging, перенос - одним SQL в той же транзакции."""
+        rows, errors, isins = 0, [], set()
+        reader = cls.read_rows(lines=lines)
+        async with unit_of_work():
+            await BrokerImportDAO.create_staging()
+            while batch := list(islice(reader, cls.batch_size)):
+                records, batch_errors = cls.validate(batch=batch)
+                rows += len(batch)
+                errors.extend(batch_errors)
+                isins.update(record[3] for record in records if record[3])
+                if records:
+                    await BrokerImportDAO.copy_many(records=records)
+            if isins:
+                # Котировки недостающих бумаг один раз берутся с MOEX и сохраняются в той же транзакции
+                await QuotesService.get_snapshot(isins=sorted(isins))
+            merged = await BrokerImportDAO.merge()
+        result = BrokerImportResultDTO(
+            rows=rows,
+            imported=merged["imported"],
+            duplicates=merged["duplicates"],
+            invalid=len(errors),
+            isins=sorted(isins - set(merged["unknown"])),
+            unknown_isins=merged["unknown"],
+            errors=errors[: cls.max_errors],
+        )
+        logger.info(
+            f"Импорт отчёта: {result.rows} строк, проведено {result.imported}, повторов {result.duplicates}, "
+            f"с ошибками {result.invalid}, неизвестных ISIN {len(result.unknown_isins)}"
+        )
+        return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    from services.http_client import HttpClient
+
+    async def main():
+        try:
+            with open(sys.argv[1], encoding="utf-8-sig", newline="") as file:
+                result = await BrokerImport.run(lines=file)
+        finally:
+            await HttpClient.close()
+        for error in result.errors:
+            logger.warning(error)
+        if result.isins:
+            logger.info("Задачи по импортированным бумагам поставит ближайшее обновление котировок в приложении")
+
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from create_app import logger
+
+T = TypeVar("T")
+
+
+class SnapshotCache(Generic[T]):
+    """
+    Кэш одного значения с TTL.
+    Параллельные вызовы ждут одну загрузку, а после истечения TTL отдаётся
+    последнее удачное значение, пока свежее грузится в фоне.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[T]], ttl: float, name: str):
+        self.loader = loader
+        self.ttl = ttl
+        self.name = name
+        self.value: T | None = None
+        self.loaded_at: float | None = None
+        self.__task: asyncio.Task | None = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl
+
+    async def __load(self) -> T:
+        try:
+            value = await self.loader()
+        except Exception as ex:
+            if self.value is None:
+                raise
+            logger.warning(f"{self.name}: обновление не удалось, отдаём прошлый снимок: {ex!r}")
+            return self.value
+        self.value = value
+        self.loaded_at = time.monotonic()
+        return value
+
+    def refresh(self) -> asyncio.Task:
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__load())
+        return self.__task
+
+    async def get(self) -> T:
+        if self.value is not None:
+            if not self.is_fresh:
+                self.refresh()
+            return self.value
+        return await asyncio.shield(self.refresh())
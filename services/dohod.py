@@ -1,75 +1,164 @@
-import httpx
+import hashlib
+import heapq
 import json
+from datetime import date
+from operator import itemgetter
 
-from pydantic import BaseModel
+from config import config
+from create_app import logger
+from models.schemas import DohodItem, MoexBondDTO
+from models.sql_dao import BondQuotesDAO, BondsDAO, CachedPayloadsDAO
+from services.cache import SnapshotCache
+from services.http_client import HttpClient
+from services.moex import MoexAPI, snapshot_cache
+from services.quotes import QuotesService
+from services.screener import BondScreener
 
-from models.schemas import MoexBondDTO
-from models.sql_dao import BondsDAO
-from services.moex import MoexAPI
 
+class DohodUniverse:
+    """
+    Выгрузка dohod.ru, сжатая до [isin, цена в копейках, доходность в %].
+    Последняя удачная копия хранится в cached_payloads и отдаётся, если сайт недоступен.
+    """
 
-class DohodItem(BaseModel):
-    isin: str
-    price: int
-    price_return: int
-    amount: int = 0
+    cache_key = "dohod_universe"
+    __digest: str | None = None
+    __universe: list[list] | None = None
+
+    @classmethod
+    async def __download(cls) -> list[list]:
+        payload = [("customFilters[strategy][]", "strategy1"), ("customFilters[strategy][]", "strategy1")]
+        session = HttpClient.get_session()
+        async with session.post(
+            url="https://www.dohod.ru/assets/components/dohodbonds/connectorweb.php?action=info", data=payload
+        ) as response:
+            response.raise_for_status()
+            body = await response.read()
+        digest = hashlib.sha1(body).hexdigest()
+        if digest == cls.__digest and cls.__universe is not None:
+            return cls.__universe
+        universe = [
+            [
+                item["xml_isin"],
+                int(item["nominal"]) * float(item["price"]) + float(item["nkd"]) * 100,
+                float(item["price_return"]),
+            ]
+            for item in json.loads(body)
+        ]
+        await CachedPayloadsDAO.save(key=cls.cache_key, payload=universe)
+        cls.__digest, cls.__universe = digest, universe
+        return universe
+
+    @classmethod
+    async def load(cls) -> list[list]:
+        try:
+            return await cls.__download()
+        except Exception as ex:
+            universe = await CachedPayloadsDAO.get(key=cls.cache_key)
+            if universe is None:
+                raise
+            logger.warning(f"dohod.ru недоступен, берём сохранённую выгрузку: {ex!r}")
+            return universe
+
+
+dohod_cache: SnapshotCache[list[list]] = SnapshotCache(
+    loader=DohodUniverse.load, ttl=config.dohod_cache_ttl, name="dohod"
+)
 
 
 class BuyRecommendation:
-    def __init__(self, dohod_bonds: list[DohodItem]):
+    def __init__(
+        self, dohod_bonds: list[DohodItem], issuer_values: dict[str, int] | None = None, portfolio_value: int = 0
+    ):
         self.dohod_bonds = dohod_bonds
+        # Стоимость всего портфеля и вложения в каждого эмитента - база для max_issuer_weight
+        self.issuer_values = issuer_values or {}
+        self.portfolio_value = portfolio_value
 
     @staticmethod
-    async def parse_dohod() -> list[DohodItem]:
-        payload = {"customFilters[strategy][]": ["strategy1", "strategy1"]}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url="https://www.dohod.ru/assets/components/dohodbonds/connectorweb.php?action=info", data=payload
-            )
-        data = json.loads(response.text)
-        sorted_data = sorted(data, key=lambda x: float(x["price_return"]), reverse=True)
-        result = []
-        for item in sorted_data:
-            price = int(item["nominal"]) * float(item["price"]) + float(item["nkd"]) * 100
-            if price > 150000:
-                continue
-            result.append(
-                DohodItem(
-                    isin=item["xml_isin"],
-                    price=int(price),
-                    price_return=int(float(item["price_return"]) * 100),
-                )
-            )
-        return result[:5]
+    async def parse_dohod(limit: int = config.recommendations_limit) -> list[DohodItem]:
+        universe = await dohod_cache.get()
+        candidates = (item for item in universe if item[1] <= 150000)
+        return [
+            DohodItem(isin=isin, price=int(price), price_return=int(price_return * 100))
+            for isin, price, price_return in heapq.nlargest(limit, candidates, key=itemgetter(2))
+        ]
+
+    @staticmethod
+    async def screen() -> list[DohodItem]:
+        snapshot = snapshot_cache.value or await QuotesService.get_snapshot()
+        return BondScreener.screen(snapshot=snapshot, today=date.today())
 
     @classmethod
     async def create(cls, bonds: list[MoexBondDTO]) -> "BuyRecommendation":
-        result = await cls.parse_dohod()
+        if config.recommendations_source == "screener":
+            result = await cls.screen()
+        else:
+            result = await cls.parse_dohod()
         print(f"DOHOD: {result}")
         cur_bonds_amount = {bond.isin: bond.amount for bond in bonds}
         for bond in result:
             amount = cur_bonds_amount.get(bond.isin, 0)
             bond.amount = amount
-        return cls(dohod_bonds=result)
+        # Эмитента (и для dohod.ru - оборот и лот) берём из bond_quotes: справочник ISS читает фоновая задача
+        isins = list(dict.fromkeys([bond.isin for bond in bonds] + [bond.isin for bond in result]))
+        quotes = {quote.isin: quote for quote in await BondQuotesDAO.get_many(isins=isins)}
+        issuer_values = {}
+        for bond in bonds:
+            quote = quotes.get(bond.isin)
+            if quote is not None and quote.issuer and bond.price is not None:
+                issuer_values[quote.issuer] = issuer_values.get(quote.issuer, 0) + bond.price
+        for bond in result:
+            quote = quotes.get(bond.isin)
+            if quote is None:
+                continue
+            bond.issuer = quote.issuer
+            if config.recommendations_source == "dohod":
+                bond.liquidity = quote.turnover
+                bond.lot = quote.lot_size or 1
+        portfolio_value = sum(bond.price for bond in bonds if bond.price is not None)
+        return cls(dohod_bonds=result, issuer_values=issuer_values, portfolio_value=portfolio_value)
 
-    def get(self, budget: int) -> dict[str, int]:
+    def get(
+        self,
+        budget: int,
+        max_issuer_weight: float | None = None,
+        min_liquidity: float = 0,
+        cash_reserve: int = 0,
+    ) -> dict[str, int]:
         """
-        Генерирует рекомендации по покупке облигаций из топ-5 по доходности,
-        чтобы распределение бумаг в портфеле стремилось к равномерному.
+        Генерирует рекомендации по покупке облигаций, чтобы распределение бумаг
+        в портфеле стремилось к равномерному.
+        Бумаги лежат в куче по (стоимость в портфеле, -доходность), поэтому каждая покупка стоит O(log n).
+        Ограничения: доля одного эмитента, размер лота, минимальная ликвидность и неприкосновенный остаток.
+        Доля эмитента считается от всего портфеля (issuer_values, portfolio_value) вместе с бюджетом покупки.
         """
         # Предварительно сортируем по доходности для приоритета при равенстве количества
         self.dohod_bonds.sort(key=lambda x: -x.price_return)
+        candidates = [bond for bond in self.dohod_bonds if min_liquidity <= 0 or (bond.liquidity or 0) >= min_liquidity]
+        budget -= cash_reserve
+        issuer_values = dict(self.issuer_values)
+        issuer_cap = None
+        if max_issuer_weight is not None:
+            issuer_cap = max_issuer_weight * (max(budget, 0) + self.portfolio_value)
+        # Индекс в списке разрешает равенство так же, как стабильная сортировка
+        heap = [(bond.amount * bond.price, -bond.price_return, i) for i, bond in enumerate(candidates)]
+        heapq.heapify(heap)
         result = {}
-        while True:
-            # Сортировка: сначала по amount, затем по убыванию доходности
-            sorted_bonds = sorted(self.dohod_bonds, key=lambda x: (x.amount * x.price, -x.price_return))
-            # Находим бумагу с наименьшим количеством в портфеле, чтобы не "перекачивать" бюджет в одну бумагу
-            candidate = sorted_bonds[0]
-            if budget < candidate.price:
+        while heap:
+            candidate = candidates[heap[0][2]]
+            lot_price = candidate.price * candidate.lot
+            if budget < lot_price:
                 break
-            candidate.amount += 1
-            budget -= candidate.price
-            result[candidate.isin] = result.get(candidate.isin, 0) + 1
+            if issuer_cap is not None and candidate.issuer:
+                if issuer_values.get(candidate.issuer, 0) + lot_price > issuer_cap:
+                    heapq.heappop(heap)
+                    continue
+                issuer_values[candidate.issuer] = issuer_values.get(candidate.issuer, 0) + lot_price
+            candidate.amount += candidate.lot
+            budget -= lot_price
+            result[candidate.isin] = result.get(candidate.isin, 0) + candidate.lot
+            heapq.heapreplace(heap, (candidate.amount * candidate.price, -candidate.price_return, heap[0][2]))
         return result
 
 
@@ -77,11 +166,22 @@ async def test():
     sql_bonds = await BondsDAO.get_many()
     bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds)
     service = await BuyRecommendation.create(bonds=bonds)
-    result = service.get(budget=672829)
+    result = service.get(
+        budget=672829,
+        max_issuer_weight=config.recommendations_max_issuer_weight,
+        min_liquidity=config.recommendations_min_liquidity,
+        cash_reserve=config.recommendations_cash_reserve,
+    )
     print(result)
 
 
 if __name__ == "__main__":
     import asyncio
 
-    asyncio.run(test())
+    async def main():
+        try:
+            await test()
+        finally:
+            await HttpClient.close()
+
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import date, timedelta
+from operator import itemgetter
+
+from config import config
+from create_app import logger
+from models.sql_dao import BondHistoryDAO, BondsDAO
+from services.moex import BOARDS, HISTORY_COLUMNS, MoexAPI, parse_date, parse_float
+
+
+class HistoryService:
+    """Дневная история котировок в bond_history: догружаются только недостающие даты."""
+
+    @staticmethod
+    def __to_records(isin: str, block: dict) -> dict[date, tuple]:
+        # ISS отдаёт колонки в порядке своей таблицы, а не запрошенном - раскладываем по индексам
+        getter = itemgetter(*map(block["columns"].index, HISTORY_COLUMNS))
+        records = {}
+        for board_id, trade_date, close, waprice, yield_close, accrued_int, volume, value in map(getter, block["data"]):
+            if board_id not in BOARDS:
+                continue
+            trade_date = parse_date(trade_date)
+            records.setdefault(
+                trade_date,
+                (
+                    isin,
+                    trade_date,
+                    parse_float(close),
+                    parse_float(waprice),
+                    parse_float(yield_close),
+                    parse_float(accrued_int),
+                    int(volume or 0),
+                    float(value or 0),
+                ),
+            )
+        return records
+
+    @classmethod
+    async def __get_bond_history(cls, isin: str, date_from: date | None, semaphore: asyncio.Semaphore) -> list[tuple]:
+        async def get_page(start: int) -> dict:
+            async with semaphore:
+                return await MoexAPI.get_history_page(isin=isin, date_from=date_from, start=start)
+
+        first_page = await get_page(start=0)
+        cursor = first_page["history.cursor"]
+        total, page_size = itemgetter(*map(cursor["columns"].index, ("TOTAL", "PAGESIZE")))(cursor["data"][0])
+        pages = [first_page]
+        if total > page_size:
+            pages += await asyncio.gather(*(get_page(start=start) for start in range(page_size, total, page_size)))
+        records = {}
+        for page in pages:
+            for trade_date, record in cls.__to_records(isin=isin, block=page["history"]).items():
+                records.setdefault(trade_date, record)
+        return list(records.values())
+
+    @classmethod
+    async def backfill(cls, isins: list[str] | None = None) -> int:
+        """
+        Загружает историю для бумаг портфеля, уже отслеживаемых в bond_history и переданных isins.
+        Для бумаг, по которым история уже есть, берутся только даты после последней сохранённой.
+        Бумага, не загрузившаяся после повторов, пропускается - остальные сохраняются.
+        """
+        held_isins = [sql_bond.isin for sql_bond in await BondsDAO.get_many()]
+        isins = list(dict.fromkeys(held_isins + await BondHistoryDAO.get_isins() + (isins or [])))
+        if not isins:
+            return 0
+        last_dates = await BondHistoryDAO.get_last_dates(isins=isins)
+        semaphore = asyncio.Semaphore(config.moex_history_concurrency)
+        results = await asyncio.gather(
+            *(
+                cls.__get_bond_history(
+                    isin=isin,
+                    date_from=last_dates[isin] + timedelta(days=1) if isin in last_dates else None,
+                    semaphore=semaphore,
+                )
+                for isin in isins
+            ),
+            return_exceptions=True,
+        )
+        records, failed = [], []
+        for isin, result in zip(isins, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Не удалось получить историю {isin}: {result!r}")
+                failed.append(isin)
+            else:
+                records.extend(result)
+        if records:
+            await BondHistoryDAO.copy_many(records=records)
+        logger.info(f"История MOEX: {len(records)} новых строк по {len(isins)} бумагам, с ошибкой {len(failed)}")
+        return len(records)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from services.http_client import HttpClient
+
+    async def main():
+        try:
+            await HistoryService.backfill(isins=sys.argv[1:])
+        finally:
+            await HttpClient.close()
+
+    asyncio.run(main())
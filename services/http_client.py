@@ -0,0 +1,39 @@
+import aiohttp
+
+from config import config
+from create_app import logger
+
+
+class HttpClient:
+    """Общая на всё приложение aiohttp-сессия с пулом keep-alive соединений."""
+
+    __session: aiohttp.ClientSession | None = None
+
+    @staticmethod
+    def __create_session() -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=config.http_pool_limit,
+            limit_per_host=config.http_pool_limit_per_host,
+            ttl_dns_cache=config.http_dns_cache_ttl,
+            keepalive_timeout=config.http_keepalive_timeout,
+        )
+        timeout = aiohttp.ClientTimeout(total=config.http_total_timeout, connect=config.http_connect_timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        if cls.__session is None or cls.__session.closed:
+            cls.__session = cls.__create_session()
+        return cls.__session
+
+    @classmethod
+    async def start(cls):
+        cls.get_session()
+        logger.info("HTTP client started")
+
+    @classmethod
+    async def close(cls):
+        if cls.__session is not None and not cls.__session.closed:
+            await cls.__session.close()
+        cls.__session = None
+        logger.info("HTTP client stopped")
@@ -0,0 +1,28 @@
+import asyncio
+
+from create_app import logger
+from models.sql_dao import MoneyTotalsDAO
+
+
+class LedgerAudit:
+    """Сверка остатков money_totals с полной суммой журнала money_balances."""
+
+    @staticmethod
+    async def run(fix: bool = False) -> bool:
+        drift = await MoneyTotalsDAO.audit()
+        if not drift:
+            logger.info("money_totals сходится с журналом")
+            return True
+        for currency, total, ledger in drift:
+            logger.warning(f"{currency}: в money_totals {total}, по журналу {ledger}, разница {total - ledger}")
+        if fix:
+            await MoneyTotalsDAO.rebuild()
+            logger.info("money_totals пересчитан по журналу")
+        return False
+
+
+if __name__ == "__main__":
+    import sys
+
+    ok = asyncio.run(LedgerAudit.run(fix="--fix" in sys.argv[1:]))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,38 @@
+from models.schemas import BondQuoteDTO, DbBondDTO, MarketEventDTO
+from services.moex import position_nominal
+
+# Поле bond_quotes -> событие при его изменении
+EVENT_FIELDS = {
+    "coupon_value": "coupon_value",
+    "coupon_date": "coupon_date",
+    "buyback_date": "offer",
+    "maturity_date": "maturity",
+}
+
+
+class MarketEventDetector:
+    """Сравнивает свежую доску с сохранённым снимком bond_quotes одним проходом по портфелю."""
+
+    @staticmethod
+    def detect(
+        sql_bonds: list[DbBondDTO], stored: dict[str, BondQuoteDTO], records: dict[str, dict]
+    ) -> list[MarketEventDTO]:
+        events = []
+        for sql_bond in sql_bonds:
+            new = records.get(sql_bond.isin)
+            if new is None or new["face_value"] is None:
+                continue
+            # Амортизация - номинал на доске ниже учтённого в портфеле; после проводки cur_nominal сравняется
+            nominal = position_nominal(face_value=new["face_value"], amount=sql_bond.amount)
+            if nominal < sql_bond.cur_nominal:
+                events.append(
+                    MarketEventDTO(isin=sql_bond.isin, kind="amortization", old=sql_bond.cur_nominal, new=nominal)
+                )
+            old = stored.get(sql_bond.isin)
+            if old is None:
+                continue
+            for field, kind in EVENT_FIELDS.items():
+                value = getattr(old, field)
+                if new[field] != value:
+                    events.append(MarketEventDTO(isin=sql_bond.isin, kind=kind, old=value, new=new[field]))
+        return events
@@ -1,32 +1,241 @@
 import asyncio
-from datetime import datetime
-from typing import Literal
+from datetime import date
+from operator import itemgetter
+from typing import Literal, NamedTuple
 
 import aiohttp
 from aiohttp import ClientConnectorError, ClientPayloadError, ClientResponseError, ServerTimeoutError
-from bs4 import BeautifulSoup
+from lxml import etree
 
 from config import config
 from create_app import logger
 from models.schemas import DbBondDTO, MoexBondDTO
+from services.cache import SnapshotCache
+from services.http_client import HttpClient
+
+
+class MoexRow(NamedTuple):
+    # XML отдаёт строки, JSON - уже числа и null, bond_quotes - числа и даты
+    secid: str
+    secname: str
+    facevalue: str | float
+    prevwaprice: str | float | None
+    accruedint: str | float
+    couponvalue: str | float | None
+    nextcoupon: str | date | None
+    matdate: str | date | None
+    buybackdate: str | date | None
+    couponperiod: str | int | None
+    lotsize: str | int | None = None
+    # оборот за день из блока marketdata
+    valtoday: str | float | None = None
+    # emitent_id из справочника ISS - на доске его нет, заполняется только из bond_quotes
+    issuer: str | None = None
+
+
+COLUMNS = tuple(field.upper() for field in MoexRow._fields if field not in ("valtoday", "issuer"))
+MARKETDATA_COLUMNS = ("SECID", "VALTODAY")
+BOARDS = ("TQCB", "TQOB")
+ESTIMATED_BOARD_SIZE = 3000
+LOOKUP_CHUNK_SIZE = 50
+HISTORY_COLUMNS = ("BOARDID", "TRADEDATE", "CLOSE", "WAPRICE", "YIELDCLOSE", "ACCINT", "VOLUME", "VALUE")
+BONDIZATION_COLUMNS = {
+    "coupons": ("coupondate", "value"),
+    "amortizations": ("amortdate", "value", "data_source"),
+    "offers": ("offerdate", "price"),
+}
+
+
+def parse_float(value: str | float | None) -> float | None:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def parse_date(value: str | date | None) -> date | None:
+    if value is None or value in ("", "0000-00-00"):
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def position_nominal(face_value: float, amount: int) -> int:
+    """Номинал позиции в копейках; дробная часть номинала отбрасывается - так же считает BrokerImportDAO.merge."""
+    return int(face_value) * amount * 100
+
+
+class MoexBoardParser:
+    """
+    Потоковый разбор securities.xml: из блока securities берутся только COLUMNS,
+    из marketdata - оборот, обработанные элементы сразу освобождаются.
+    """
+
+    def __init__(self):
+        self.rows: dict[str, MoexRow] = {}
+        self.__turnover: dict[str, str] = {}
+        self.__parser = etree.XMLPullParser(events=("start", "end"), tag=("data", "row"))
+        self.__block = None
+
+    def feed(self, chunk: bytes):
+        self.__parser.feed(chunk)
+        self.__consume()
+
+    def close(self) -> dict[str, MoexRow]:
+        self.__parser.close()
+        self.__consume()
+        for isin, valtoday in self.__turnover.items():
+            if isin in self.rows:
+                self.rows[isin] = self.rows[isin]._replace(valtoday=valtoday)
+        return self.rows
+
+    def __consume(self):
+        for event, elem in self.__parser.read_events():
+            if elem.tag == "data":
+                self.__block = elem.get("id") if event == "start" else None
+                continue
+            if event != "end":
+                continue
+            if self.__block == "securities":
+                row = MoexRow(*map(elem.get, COLUMNS))
+                self.rows.setdefault(row.secid, row)
+            elif self.__block == "marketdata":
+                self.__turnover.setdefault(elem.get("SECID"), elem.get("VALTODAY"))
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+class MoexSnapshot:
+    """Индекс строк досок TQOB/TQCB по SECID, разобранных один раз."""
+
+    def __init__(self, rows: dict[str, MoexRow]):
+        # Даты разбираются один раз на снимок, а не в каждом get_bond и ранжировании
+        self.rows = {isin: self.__parse_dates(row=row) for isin, row in rows.items()}
+
+    @staticmethod
+    def __parse_dates(row: MoexRow) -> MoexRow:
+        if all(value is None or isinstance(value, date) for value in (row.nextcoupon, row.matdate, row.buybackdate)):
+            return row
+        return row._replace(
+            nextcoupon=parse_date(row.nextcoupon),
+            matdate=parse_date(row.matdate),
+            buybackdate=parse_date(row.buybackdate),
+        )
+
+    @classmethod
+    def from_boards(cls, boards: list[dict[str, MoexRow]]) -> "MoexSnapshot":
+        rows = {}
+        for board in boards:
+            for isin, row in board.items():
+                rows.setdefault(isin, row)
+        return cls(rows=rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, isin: str) -> bool:
+        return isin in self.rows
+
+    def get_bond(self, sql_bond: DbBondDTO, require_price: bool = True) -> MoexBondDTO | None:
+        """
+        None - бумаги нет на доске или строка неполная (нет номинала или даты погашения).
+        Без сделок за прошлый день PREVWAPRICE пустой: с require_price=False профиль отдаётся с price=None,
+        расчётам по купонам цена не нужна.
+        """
+        row = self.rows.get(sql_bond.isin)
+        if row is None:
+            return None
+        redemption_date = parse_date(row.buybackdate) or parse_date(row.matdate)
+        face_value = parse_float(row.facevalue)
+        waprice = parse_float(row.prevwaprice)
+        if redemption_date is None or face_value is None or (require_price and waprice is None):
+            return None
+        nominal = position_nominal(face_value=face_value, amount=sql_bond.amount)
+        price = None
+        if waprice is not None:
+            nkd = int((parse_float(row.accruedint) or 0) * sql_bond.amount * 100)
+            price = int(waprice * nominal * 0.01) + nkd
+        return MoexBondDTO(
+            id=sql_bond.id,
+            amount=sql_bond.amount,
+            title=row.secname,
+            isin=sql_bond.isin,
+            coupon_date=parse_date(row.nextcoupon),
+            coupon_price=int((parse_float(row.couponvalue) or 0) * sql_bond.amount * 100),
+            nominal=nominal,
+            price=price,
+            redemption_date=redemption_date,
+            cur_coupon=sql_bond.cur_coupon,
+            cur_nominal=sql_bond.cur_nominal,
+        )
 
 
 class MoexAPI:
 
     @staticmethod
-    async def __get_request(section: Literal["TQOB", "TQCB"], retries: int = 10, delay: float = 3) -> str:
-        url = f"https://iss.moex.com/iss/engines/stock/markets/bonds/boards/{section}/securities.xml"
+    async def __read_xml(resp: aiohttp.ClientResponse) -> dict[str, MoexRow]:
+        parser = MoexBoardParser()
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            parser.feed(chunk)
+        return parser.close()
+
+    @staticmethod
+    async def __read_json(resp: aiohttp.ClientResponse) -> dict[str, MoexRow]:
+        payload = await resp.json(content_type=None)
+        block = payload["securities"]
+        data = block["data"]
+        if tuple(block["columns"]) != COLUMNS:
+            getter = itemgetter(*(block["columns"].index(column) for column in COLUMNS))
+            data = map(getter, data)
+        # ISS может вернуть колонки не в запрошенном порядке - и здесь, и в marketdata берём по индексу
+        marketdata = payload["marketdata"]
+        isin_index, turnover_index = map(marketdata["columns"].index, MARKETDATA_COLUMNS)
+        turnover = {}
+        for item in marketdata["data"]:
+            turnover.setdefault(item[isin_index], item[turnover_index])
+        rows = {}
+        for item in data:
+            rows.setdefault(item[0], MoexRow(*item, turnover.get(item[0])))
+        return rows
+
+    @staticmethod
+    async def __read_lookup_json(resp: aiohttp.ClientResponse) -> dict[str, MoexRow]:
+        payload = await resp.json(content_type=None)
+        block = payload["securities"]
+        board_index = block["columns"].index("BOARDID")
+        getter = itemgetter(*(block["columns"].index(column) for column in COLUMNS))
+        marketdata = payload["marketdata"]
+        board_id_index, isin_index, turnover_index = map(marketdata["columns"].index, ("BOARDID",) + MARKETDATA_COLUMNS)
+        turnover = {(item[board_id_index], item[isin_index]): item[turnover_index] for item in marketdata["data"]}
+        boards = {board: {} for board in BOARDS}
+        for item in block["data"]:
+            board = boards.get(item[board_index])
+            if board is not None:
+                row = MoexRow(*getter(item))
+                row = row._replace(valtoday=turnover.get((item[board_index], row.secid)))
+                board.setdefault(row.secid, row)
+        return MoexSnapshot.from_boards(boards=list(boards.values())).rows
+
+    @staticmethod
+    async def __fetch(url: str, params: dict | None, reader, retries: int = 10, delay: float = 3):
         attempt = 0
         while True:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url=url, proxy=config.rus_proxy) as resp:
-                        if resp.status == 200:
-                            return await resp.text()
-                        else:
-                            logger.warning(f"MOEX RESP NON-200: {resp.status}")
-                            raise ClientResponseError(resp.request_info, resp.history, status=resp.status)
-            except (ConnectionResetError, ClientConnectorError, ClientPayloadError, ServerTimeoutError) as ex:
+                session = HttpClient.get_session()
+                async with session.get(url=url, params=params, proxy=config.rus_proxy) as resp:
+                    if resp.status == 200:
+                        return await reader(resp)
+                    else:
+                        logger.warning(f"MOEX RESP NON-200: {resp.status}")
+                        raise ClientResponseError(resp.request_info, resp.history, status=resp.status)
+            except (
+                ConnectionResetError,
+                ClientConnectorError,
+                ClientPayloadError,
+                ServerTimeoutError,
+                asyncio.TimeoutError,
+            ) as ex:
                 attempt += 1
                 logger.warning(f"Попытка {attempt}/{retries} не удалась: {ex!r}")
                 if attempt >= retries:
@@ -36,52 +245,141 @@ class MoexAPI:
                 logger.error(f"Неожиданная ошибка при запросе MOEX: {ex!r}")
                 raise
 
+    @classmethod
+    async def __get_request(cls, section: Literal["TQOB", "TQCB"]) -> dict[str, MoexRow]:
+        url = f"https://iss.moex.com/iss/engines/stock/markets/bonds/boards/{section}/securities"
+        url = f"{url}.{config.moex_fetch_mode}"
+        if config.moex_fetch_mode == "json":
+            params = {
+                "iss.meta": "off",
+                "iss.only": "securities,marketdata",
+                "securities.columns": ",".join(COLUMNS),
+                "marketdata.columns": ",".join(MARKETDATA_COLUMNS),
+            }
+            return await cls.__fetch(url=url, params=params, reader=cls.__read_json)
+        return await cls.__fetch(url=url, params=None, reader=cls.__read_xml)
+
+    @classmethod
+    async def lookup(cls, isins: list[str]) -> MoexSnapshot:
+        url = "https://iss.moex.com/iss/engines/stock/markets/bonds/securities.json"
+        chunks = [isins[i : i + LOOKUP_CHUNK_SIZE] for i in range(0, len(isins), LOOKUP_CHUNK_SIZE)]
+        requests = []
+        for chunk in chunks:
+            params = {
+                "iss.meta": "off",
+                "iss.only": "securities,marketdata",
+                "securities": ",".join(chunk),
+                "securities.columns": ",".join(("BOARDID",) + COLUMNS),
+                "marketdata.columns": ",".join(("BOARDID",) + MARKETDATA_COLUMNS),
+            }
+            requests.append(cls.__fetch(url=url, params=params, reader=cls.__read_lookup_json, retries=3))
+        return MoexSnapshot.from_boards(boards=list(await asyncio.gather(*requests)))
+
     @staticmethod
-    async def __get_one_bond_data(moex_data_list: list[str], sql_bond: DbBondDTO) -> MoexBondDTO | None:
-        for moex_data in moex_data_list:
-            soup = BeautifulSoup(moex_data, features="xml")
-            rows = soup.find(name="data", attrs={"id": "securities"}).find_all("row")
-            for row in rows:
-                if row["SECID"] == sql_bond.isin:
-                    redemption_date = row["MATDATE"] if row["BUYBACKDATE"] == "0000-00-00" else row["BUYBACKDATE"]
-                    redemption_date = datetime.strptime(redemption_date, "%Y-%m-%d").date()
-                    coupon_date = datetime.strptime(row["NEXTCOUPON"], "%Y-%m-%d").date()
-                    nominal = int(row["FACEVALUE"]) * sql_bond.amount * 100
-                    price = int(float(row["PREVWAPRICE"]) * nominal * 0.01)
-                    nkd = int(float(row["ACCRUEDINT"]) * sql_bond.amount * 100)
-                    return MoexBondDTO(
-                        id=sql_bond.id,
-                        amount=sql_bond.amount,
-                        title=row["SECNAME"],
-                        isin=sql_bond.isin,
-                        coupon_date=coupon_date,
-                        coupon_price=int(float(row["COUPONVALUE"]) * sql_bond.amount * 100),
-                        nominal=nominal,
-                        price=price + nkd,
-                        redemption_date=redemption_date,
-                        cur_coupon=sql_bond.cur_coupon,
-                        cur_nominal=sql_bond.cur_nominal,
-                    )
-        return None
+    async def __read_raw_json(resp: aiohttp.ClientResponse) -> dict:
+        return await resp.json(content_type=None)
+
+    @classmethod
+    async def get_history_page(cls, isin: str, date_from: date | None = None, start: int = 0) -> dict:
+        url = f"https://iss.moex.com/iss/history/engines/stock/markets/bonds/securities/{isin}.json"
+        params = {
+            "iss.meta": "off",
+            "iss.only": "history,history.cursor",
+            "history.columns": ",".join(HISTORY_COLUMNS),
+            "start": start,
+        }
+        if date_from is not None:
+            params["from"] = date_from.isoformat()
+        return await cls.__fetch(url=url, params=params, reader=cls.__read_raw_json, retries=3)
+
+    @classmethod
+    async def get_bondization(cls, isin: str) -> dict:
+        url = f"https://iss.moex.com/iss/securities/{isin}/bondization.json"
+        params = {
+            "iss.meta": "off",
+            "iss.only": "coupons,amortizations,offers",
+            "limit": "unlimited",
+            **{f"{block}.columns": ",".join(columns) for block, columns in BONDIZATION_COLUMNS.items()},
+        }
+        return await cls.__fetch(url=url, params=params, reader=cls.__read_raw_json, retries=3)
 
     @classmethod
-    async def get_bonds_profiles(cls, sql_bonds: list[DbBondDTO]) -> list[MoexBondDTO]:
-        ofz_moex_data = await cls.__get_request(section="TQOB")
-        other_moex_data = await cls.__get_request(section="TQCB")
+    async def load_issuers(cls) -> dict[str, str]:
+        """
+        Эмитенты (emitent_id) всех торгуемых облигаций из справочника ISS - постранично, по 100 бумаг.
+        Ключи - и SECID, и ISIN: в bond_quotes бумага записана под SECID доски.
+        """
+        url = "https://iss.moex.com/iss/securities.json"
+        issuers, start = {}, 0
+        while True:
+            params = {
+                "iss.meta": "off",
+                "iss.only": "securities",
+                "engine": "stock",
+                "market": "bonds",
+                "is_trading": 1,
+                "securities.columns": "secid,isin,emitent_id",
+                "start": start,
+            }
+            payload = await cls.__fetch(url=url, params=params, reader=cls.__read_raw_json, retries=3)
+            block = payload["securities"]
+            if not block["data"]:
+                return issuers
+            secid_index, isin_index, issuer_index = map(block["columns"].index, ("secid", "isin", "emitent_id"))
+            for item in block["data"]:
+                if item[issuer_index] is not None:
+                    issuers[item[secid_index]] = issuers[item[isin_index]] = str(item[issuer_index])
+            start += len(block["data"])
+
+    @staticmethod
+    def __use_lookup(isins: list[str]) -> bool:
+        if snapshot_cache.is_fresh:
+            return False
+        board_size = len(snapshot_cache.value) if snapshot_cache.value is not None else ESTIMATED_BOARD_SIZE
+        return len(isins) <= board_size * config.moex_lookup_ratio
+
+    @classmethod
+    async def load_snapshot(cls) -> MoexSnapshot:
+        ofz_moex_data, other_moex_data = await asyncio.gather(
+            cls.__get_request(section="TQOB"), cls.__get_request(section="TQCB")
+        )
+        return MoexSnapshot.from_boards(boards=[other_moex_data, ofz_moex_data])
+
+    @classmethod
+    async def get_snapshot(cls) -> MoexSnapshot:
+        return await snapshot_cache.get()
+
+    @classmethod
+    async def get_snapshot_for(cls, isins: list[str]) -> MoexSnapshot:
+        """Снимок, покрывающий isins: точечный запрос, если бумаг мало, иначе полные доски."""
+        if isins and cls.__use_lookup(isins=isins):
+            return await cls.lookup(isins=isins)
+        return await cls.get_snapshot()
+
+    @classmethod
+    async def get_bonds_profiles(
+        cls, sql_bonds: list[DbBondDTO], snapshot: MoexSnapshot | None = None, require_price: bool = True
+    ) -> list[MoexBondDTO]:
+        if snapshot is None:
+            snapshot = await cls.get_snapshot_for(isins=[sql_bond.isin for sql_bond in sql_bonds])
         result = []
         for sql_bond in sql_bonds:
-            bond_data = await cls.__get_one_bond_data(
-                moex_data_list=[other_moex_data, ofz_moex_data], sql_bond=sql_bond
-            )
-            result.append(bond_data)
-        return sorted(result, key=lambda bond: bond.coupon_date)
+            bond = snapshot.get_bond(sql_bond=sql_bond, require_price=require_price)
+            if bond is None:
+                logger.warning(f"Нет котировки MOEX для {sql_bond.isin}")
+                continue
+            result.append(bond)
+        return sorted(result, key=lambda bond: (bond.coupon_date is None, bond.coupon_date or bond.redemption_date))
 
     @classmethod
-    async def get_one_bond_profile(cls, db_bond: DbBondDTO) -> MoexBondDTO | None:
-        ofz_moex_data = await cls.__get_request(section="TQOB")
-        other_moex_data = await cls.__get_request(section="TQCB")
-        bond_data = await cls.__get_one_bond_data(
-            moex_data_list=[other_moex_data, ofz_moex_data],
-            sql_bond=db_bond,
-        )
-        return bond_data
+    async def get_one_bond_profile(
+        cls, db_bond: DbBondDTO, snapshot: MoexSnapshot | None = None
+    ) -> MoexBondDTO | None:
+        if snapshot is None:
+            snapshot = await cls.get_snapshot_for(isins=[db_bond.isin])
+        return snapshot.get_bond(sql_bond=db_bond)
+
+
+snapshot_cache: SnapshotCache[MoexSnapshot] = SnapshotCache(
+    loader=MoexAPI.load_snapshot, ttl=config.moex_cache_ttl, name="MOEX"
+)
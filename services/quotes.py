@@ -0,0 +1,97 @@
+import time
+
+from config import config
+from create_app import logger
+from models.schemas import BondQuoteDTO, DbBondDTO, MarketEventDTO
+from models.sql_dao import BondQuotesDAO
+from services.market_events import MarketEventDetector
+from services.moex import MoexAPI, MoexRow, MoexSnapshot, parse_date, parse_float, snapshot_cache
+
+
+class QuotesService:
+    """Котировки в таблице bond_quotes: фоновая задача обновляет их с MOEX, остальные читают из Postgres."""
+
+    __issuers_loaded_at: float | None = None
+
+    @staticmethod
+    def to_record(row: MoexRow) -> dict:
+        return {
+            "isin": row.secid,
+            "title": row.secname,
+            "face_value": parse_float(row.facevalue),
+            "price": parse_float(row.prevwaprice),
+            "accrued_int": parse_float(row.accruedint) or 0,
+            "coupon_value": parse_float(row.couponvalue),
+            "coupon_date": parse_date(row.nextcoupon),
+            "maturity_date": parse_date(row.matdate),
+            "buyback_date": parse_date(row.buybackdate),
+            "coupon_period": int(parse_float(row.couponperiod) or 0),
+            "turnover": parse_float(row.valtoday) or 0,
+            "lot_size": int(parse_float(row.lotsize) or 0) or None,
+        }
+
+    @staticmethod
+    def to_row(quote: BondQuoteDTO) -> MoexRow:
+        return MoexRow(
+            secid=quote.isin,
+            secname=quote.title,
+            facevalue=quote.face_value,
+            prevwaprice=quote.price,
+            accruedint=quote.accrued_int,
+            couponvalue=quote.coupon_value,
+            nextcoupon=quote.coupon_date,
+            matdate=quote.maturity_date,
+            buybackdate=quote.buyback_date,
+            couponperiod=quote.coupon_period,
+            lotsize=quote.lot_size,
+            valtoday=quote.turnover,
+            issuer=quote.issuer,
+        )
+
+    @classmethod
+    async def save(cls, snapshot: MoexSnapshot, isins: list[str] | None = None):
+        rows = snapshot.rows.values() if isins is None else [snapshot.rows[isin] for isin in isins if isin in snapshot]
+        records = [cls.to_record(row=row) for row in rows if row.secname and row.facevalue not in (None, "")]
+        if records:
+            await BondQuotesDAO.upsert_many(data=records)
+
+    @classmethod
+    async def refresh(cls, sql_bonds: list[DbBondDTO]) -> list[MarketEventDTO]:
+        """Обновляет bond_quotes; возвращает события по бумагам портфеля относительно прошлого снимка."""
+        snapshot = await snapshot_cache.refresh()
+        isins = [sql_bond.isin for sql_bond in sql_bonds]
+        stored = {quote.isin: quote for quote in await BondQuotesDAO.get_many(isins=isins)}
+        await cls.save(snapshot=snapshot)
+        records = {isin: cls.to_record(row=snapshot.rows[isin]) for isin in isins if isin in snapshot}
+        return MarketEventDetector.detect(sql_bonds=sql_bonds, stored=stored, records=records)
+
+    @classmethod
+    async def refresh_issuers(cls):
+        """
+        Эмитенты в bond_quotes из справочника ISS - не чаще issuers_refresh_interval, только из фоновой задачи,
+        чтобы обработчики читали их из Postgres. Сбой не мешает обновлению котировок - повтор при следующем запуске.
+        """
+        now = time.monotonic()
+        if cls.__issuers_loaded_at is not None and now - cls.__issuers_loaded_at < config.issuers_refresh_interval:
+            return None
+        try:
+            issuers = await MoexAPI.load_issuers()
+            changed = await BondQuotesDAO.set_issuers(issuers=issuers)
+        except Exception as ex:
+            logger.warning(f"Эмитенты MOEX не обновлены: {ex!r}")
+            return None
+        cls.__issuers_loaded_at = now
+        logger.info(f"Эмитенты MOEX: {len(issuers)} бумаг в справочнике, изменено {changed}")
+        return None
+
+    @classmethod
+    async def get_snapshot(cls, isins: list[str] | None = None) -> MoexSnapshot:
+        quotes = await BondQuotesDAO.get_many(isins=isins)
+        snapshot = MoexSnapshot(rows={quote.isin: cls.to_row(quote=quote) for quote in quotes})
+        missing = [isin for isin in isins or [] if isin not in snapshot]
+        if missing:
+            # Бумаги ещё нет в bond_quotes (первый запуск) - один раз берём с MOEX и сохраняем
+            moex_snapshot = await MoexAPI.get_snapshot_for(isins=missing)
+            await cls.save(snapshot=moex_snapshot, isins=missing)
+            snapshot.rows.update({isin: moex_snapshot.rows[isin] for isin in missing if isin in moex_snapshot})
+        return snapshot
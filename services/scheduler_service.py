@@ -1,13 +1,20 @@
 import asyncio
-from datetime import datetime, timedelta
+from collections import defaultdict
+from datetime import date, datetime, timezone
 from operator import itemgetter
-from typing import Literal
 
 from config import config
 from create_app import bot, logger, scheduler
-from models.schemas import MoexBondDTO
-from models.sql_dao import MoneyBalanceDAO, BondsDAO
-from services.moex import MoexAPI
+from models.schemas import BondEventDTO, DbBondDTO, MarketEventDTO
+from models.sql_dao import BondEventsDAO, BondsDAO, TransactionsDAO, unit_of_work
+from services.history import HistoryService
+from services.moex import MoexAPI, MoexSnapshot
+from services.quotes import QuotesService
+from services.schedules import ScheduleService
+
+# Порядок расчётов внутри дня: погашение - последним. Амортизации проводит MarketEventDetector по доске
+TASKS = ("coupon", "redemption")
+MARKET_EVENT_TITLES = {"coupon_value": "Купон", "offer": "Оферта", "maturity": "Погашение"}
 
 
 class SchedulerService:
@@ -20,107 +27,233 @@ class SchedulerService:
             except Exception as ex:
                 logger.warning(ex)
 
-    @staticmethod
-    async def __get_bond_profile(isin: str) -> MoexBondDTO | None:
-        sql_bond = await BondsDAO.get_one_or_none(isin=isin)
-        if not sql_bond:
-            return None
-        moex_bond = await MoexAPI.get_one_bond_profile(db_bond=sql_bond)
-        if not moex_bond:
-            return None
-        return moex_bond
-
     @classmethod
-    async def _coupon_payment(cls, isin: str):
-        bond = await cls.__get_bond_profile(isin=isin)
-        if not bond:
-            return None
-        text = f"💡 Выплачено <i>{round(bond.coupon_price/100, 2)}₽</i> по облигации <i>{bond.title}</i> <i>({bond.amount}шт)</i>"
-        await cls.__send_message(text=text)
-        await MoneyBalanceDAO.create_with_return_id(
-            amount=bond.coupon_price, description=f"coupon_payment {bond.title}"
-        )
+    async def _settle(cls, event_date: str, events: list[list[str]]):
+        """Расчёты по всем событиям дня: одна выборка бумаг, один снимок котировок, одна транзакция и одна сводка."""
+        day = date.fromisoformat(event_date)
+        isins = {isin for _, isin in events}
+        async with unit_of_work():
+            sql_bonds = {sql_bond.isin: sql_bond for sql_bond in await BondsDAO.get_many() if sql_bond.isin in isins}
+            if not sql_bonds:
+                return None
+            snapshot = await QuotesService.get_snapshot(isins=list(sql_bonds))
+            values = {
+                (event.isin, event.kind): event.value
+                for event in await BondEventsDAO.get_many(isins=list(sql_bonds))
+                if event.event_date == day
+            }
+            balances, redeemed, lines = [], [], []
+            # Задачи, сохранённые до переноса амортизаций в детектор, могут ещё содержать "part"
+            events = sorted((event for event in events if event[0] in TASKS), key=lambda event: TASKS.index(event[0]))
+            for task, isin in events:
+                # Одна бумага с неполной строкой не должна сорвать расчёты всего дня
+                try:
+                    cls.__settle_event(
+                        task=task,
+                        isin=isin,
+                        day=day,
+                        sql_bonds=sql_bonds,
+                        snapshot=snapshot,
+                        values=values,
+                        balances=balances,
+                        redeemed=redeemed,
+                        lines=lines,
+                    )
+                except Exception as ex:
+                    logger.exception(f"Расчёт {task} по {isin} на {event_date} пропущен: {ex!r}")
+            if not balances:
+                return None
+            await TransactionsDAO.settle(balances=balances, bonds=[], redeemed=redeemed)
+        await cls.__send_message(text=f"💡 Расчёты на {day:%d.%m.%Y}:\n" + "\n".join(lines))
         return None
 
-    @classmethod
-    async def _part_redemption(cls, isin: str):
-        bond = await cls.__get_bond_profile(isin=isin)
-        if not bond:
-            return None
-        print(bond)
-        diff = bond.nominal - bond.cur_nominal
-        if diff == 0:
+    @staticmethod
+    def __settle_event(
+        task: str,
+        isin: str,
+        day: date,
+        sql_bonds: dict[str, DbBondDTO],
+        snapshot: MoexSnapshot,
+        values: dict[tuple[str, str], float | None],
+        balances: list[dict],
+        redeemed: list[str],
+        lines: list[str],
+    ):
+        bond = snapshot.get_bond(sql_bond=sql_bonds[isin], require_price=False) if isin in sql_bonds else None
+        if bond is None:
+            logger.warning(f"Расчёт {task} по {isin} на {day} пропущен: нет бумаги или котировки")
             return None
-        text = f"💡 Частичное погашение <i>{diff * bond.amount}₽</i> по облигации <i>{bond.title}</i> <i>({bond.amount}шт)</i>"
-        await cls.__send_message(text=text)
-        await BondsDAO.update_by_id(item_id=bond.id, cur_nominal=bond.nominal, cur_coupon=bond.coupon_price)
-        await MoneyBalanceDAO.create_with_return_id(
-            amount=int(diff * bond.amount * 100), description=f"part_redemption {bond.title}"
-        )
+        position = f"по <i>{bond.title}</i> <i>({bond.amount}шт)</i>"
+        if task == "coupon":
+            value = values.get((isin, "coupon"))
+            paid = bond.coupon_price if value is None else int(value * bond.amount * 100)
+            balances.append({"amount": paid, "description": f"coupon_payment {bond.title}"})
+            lines.append(f"Купон <i>{round(paid/100, 2)}₽</i> {position}")
+        elif bond.redemption_date.date() == day:
+            # Без сделок за прошлый день цены нет - гасим по номиналу
+            paid = bond.nominal if bond.price is None else bond.price
+            balances.append({"amount": paid, "description": f"bond_redemption {bond.title}"})
+            lines.append(f"Полное погашение <i>{round(paid/100, 2)}₽</i> {position}")
+            redeemed.append(isin)
+        else:
+            # Дата погашения сдвинулась - задачу переставит сверка
+            logger.info(f"Погашение {isin} перенесено на {bond.redemption_date:%d.%m.%Y}")
         return None
 
-    @classmethod
-    async def _bond_redemption(cls, isin: str) -> bool:
-        bond = await cls.__get_bond_profile(isin=isin)
-        if not bond:
-            return None
-        if bond.redemption_date.date() != datetime.today():
-            return False
-        text = f"💡 Полное погашение <i>{bond.price}₽</i> по облигации <i>{bond.title}</i> <i>({bond.amount}шт)</i>"
-        await cls.__send_message(text=text)
-        await MoneyBalanceDAO.create_with_return_id(amount=bond.price, description=f"bond_redemption {bond.title}")
-        await BondsDAO.delete(isin=isin)
-        return True
+    @staticmethod
+    def __run_time(event_date: date) -> datetime:
+        return datetime(event_date.year, event_date.month, event_date.day, hour=5, minute=0, tzinfo=timezone.utc)
 
     @classmethod
-    async def __set_task(cls, task: Literal["coupon", "part", "redemption"], isin: str, date: datetime):
-        methods = {"coupon": cls._coupon_payment, "redemption": cls._bond_redemption, "part": cls._part_redemption}
+    def __set_settlement(cls, event_date: date, events: list[list[str]]):
         scheduler.add_job(
-            func=methods[task],
+            func=cls._settle,
             trigger="date",
-            run_date=date.replace(hour=5, minute=0),
-            kwargs={"isin": isin},
+            run_date=cls.__run_time(event_date),
+            kwargs={"event_date": event_date.isoformat(), "events": events},
+            id=f"settlement_{event_date:%Y%m%d}",
+            replace_existing=True,
             misfire_grace_time=None,
         )
 
     @classmethod
-    async def set_bond(cls, isin: str, coupon_date: datetime, redemption_date: datetime):
-        await cls.__set_task(task="coupon", isin=isin, date=coupon_date)
-        await cls.__set_task(task="redemption", isin=isin, date=redemption_date)
-        await cls.__set_task(task="part", isin=isin, date=coupon_date + timedelta(days=3))
+    def __bond_tasks(cls, redemption_date: date, events: list[BondEventDTO]) -> list[tuple[str, date]]:
+        """Будущие расчёты по бумаге: купоны и погашение."""
+        now = datetime.now(timezone.utc)
+        tasks = [("redemption", redemption_date)]
+        for event in events:
+            if event.kind == "coupon" and event.event_date <= redemption_date:
+                tasks.append(("coupon", event.event_date))
+        # Прошедшие события уже отработали (или ждут в хранилище как пропущенные) - повторно их не ставим
+        return [(task, event_date) for task, event_date in tasks if cls.__run_time(event_date) > now]
+
+    @staticmethod
+    def __get_settlements() -> dict[date, list[list[str]]]:
+        return {
+            date.fromisoformat(job.kwargs["event_date"]): job.kwargs["events"]
+            for job in scheduler.get_jobs()
+            if job.id.startswith("settlement_")
+        }
 
     @classmethod
-    async def start(cls):
-        scheduler.remove_all_jobs()
+    async def schedule_bonds(cls, isins: list[str] | None = None):
+        """Сверяет расчётные задачи (одна на дату) с портфелем и переставляет только разошедшиеся даты."""
         sql_bonds = await BondsDAO.get_many()
-        moex_bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds)
+        if isins is not None:
+            sql_bonds = [sql_bond for sql_bond in sql_bonds if sql_bond.isin in isins]
+        scope = set(isins) if isins is not None else None
+        isins = [sql_bond.isin for sql_bond in sql_bonds]
+        snapshot = await QuotesService.get_snapshot(isins=isins)
+        schedules = await ScheduleService.get_many(isins=isins, fetch_missing=True)
+        moex_bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds, snapshot=snapshot, require_price=False)
+        # События бумаги без профиля на бирже не трогаем, чтобы сбой загрузки не снял их из хранилища
+        unresolved = set(isins) - {moex_bond.isin for moex_bond in moex_bonds}
+        # Хранилище задач синхронное (psycopg2) - чтение и запись уводим из цикла событий
+        existing = await asyncio.to_thread(cls.__get_settlements)
+        plan = defaultdict(set)
+        for event_date, events in existing.items():
+            for task, isin in events:
+                if (scope is not None and isin not in scope) or isin in unresolved:
+                    plan[event_date].add((task, isin))
         for moex_bond in moex_bonds:
-            await cls.set_bond(
-                isin=moex_bond.isin, coupon_date=moex_bond.coupon_date, redemption_date=moex_bond.redemption_date
-            )
+            events = schedules.get(moex_bond.isin)
+            if not events and moex_bond.coupon_date is not None:
+                # Без графика bondization знаем только ближайший купон
+                coupon_date = moex_bond.coupon_date.date()
+                events = [BondEventDTO(isin=moex_bond.isin, event_date=coupon_date, kind="coupon", value=None)]
+            redemption_date = moex_bond.redemption_date.date()
+            for task, event_date in cls.__bond_tasks(redemption_date=redemption_date, events=events or []):
+                plan[event_date].add((task, moex_bond.isin))
+        changed, removed = await asyncio.to_thread(cls.__apply_plan, existing, plan)
+        logger.info(f"Расчётные задачи сверены: изменено {changed}, снято {removed}, всего {len(plan)}")
+
+    @classmethod
+    def __apply_plan(cls, existing: dict[date, list[list[str]]], plan: dict[date, set]) -> tuple[int, int]:
+        removed = [event_date for event_date in existing if not plan.get(event_date)]
+        for event_date in removed:
+            scheduler.remove_job(f"settlement_{event_date:%Y%m%d}")
+        changed = 0
+        for event_date, events in plan.items():
+            events = [list(event) for event in sorted(events, key=lambda event: (TASKS.index(event[0]), event[1]))]
+            if existing.get(event_date) != events:
+                cls.__set_settlement(event_date=event_date, events=events)
+                changed += 1
+        return changed, len(removed)
+
+    @classmethod
+    async def __apply_market_events(cls, sql_bonds: list[DbBondDTO], events: list[MarketEventDTO]):
+        """Амортизации - в учёт одной транзакцией, изменения купона, оферты и погашения - в сводку."""
+        sql_bonds = {sql_bond.isin: sql_bond for sql_bond in sql_bonds}
+        async with unit_of_work():
+            snapshot = await QuotesService.get_snapshot(isins=sorted({event.isin for event in events}))
+            balances, updates, lines = [], [], []
+            for event in events:
+                try:
+                    bond = snapshot.get_bond(sql_bond=sql_bonds[event.isin], require_price=False)
+                except Exception as ex:
+                    logger.exception(f"Событие {event.kind} по {event.isin} пропущено: {ex!r}")
+                    continue
+                if bond is None:
+                    continue
+                position = f"по <i>{bond.title}</i> <i>({bond.amount}шт)</i>"
+                if event.kind == "amortization":
+                    paid = event.old - event.new
+                    balances.append({"amount": paid, "description": f"part_redemption {bond.title}"})
+                    updates.append({"id": bond.id, "cur_nominal": event.new, "cur_coupon": bond.coupon_price})
+                    lines.append(f"Частичное погашение <i>{round(paid/100, 2)}₽</i> {position}")
+                elif event.kind in MARKET_EVENT_TITLES:
+                    lines.append(f"{MARKET_EVENT_TITLES[event.kind]} {position}: {event.old} → {event.new}")
+            if balances:
+                await TransactionsDAO.settle(balances=balances, bonds=updates, redeemed=[])
+        if lines:
+            await cls.__send_message(text="💡 Изменения на бирже:\n" + "\n".join(lines))
+
+    @classmethod
+    async def _refresh_quotes(cls):
+        """
+        Одно сравнение доски с прошлым снимком на весь портфель; по событиям - учёт и перестановка задач.
+        Бумаги без единой расчётной задачи (импорт отчёта брокера идёт мимо планировщика) ставятся заодно.
+        """
+        sql_bonds = await BondsDAO.get_many()
+        events = await QuotesService.refresh(sql_bonds=sql_bonds)
+        await QuotesService.refresh_issuers()
+        changed = sorted({event.isin for event in events})
+        if events:
+            await cls.__apply_market_events(sql_bonds=sql_bonds, events=events)
+            await ScheduleService.refresh(isins=changed)
+        scheduled = {isin for events in (await asyncio.to_thread(cls.__get_settlements)).values() for _, isin in events}
+        unscheduled = sorted({sql_bond.isin for sql_bond in sql_bonds} - scheduled - set(changed))
+        if changed or unscheduled:
+            await cls.schedule_bonds(isins=changed + unscheduled)
+        return None
+
+    @classmethod
+    async def start(cls):
+        """Поднимает планировщик на сохранённых задачах; сверку с портфелем (schedule_bonds) запускает прогрев."""
+        scheduler.add_job(
+            func=cls._refresh_quotes,
+            trigger="interval",
+            seconds=config.quotes_refresh_interval,
+            id="refresh_quotes",
+            replace_existing=True,
+            next_run_time=datetime.now(timezone.utc),
+        )
+        scheduler.add_job(
+            func=HistoryService.backfill, trigger="cron", hour=22, minute=0, id="append_history", replace_existing=True
+        )
         scheduler.start()
 
     @classmethod
-    def get_scheduled_tasks(cls):
-        jobs = scheduler.get_jobs()
+    async def get_scheduled_tasks(cls):
         result = []
-        for job in jobs:
-            params = job.kwargs or {}
-            isin = params.get("isin")
-            func_name = job.func.__name__
-            if func_name == "_coupon_payment":
-                task = "coupon"
-            elif func_name == "_bond_redemption":
-                task = "redemption"
-            elif func_name == "_part_redemption":
-                task = "part"
-            else:
-                task = None
-            if task and isin:
+        for job in await asyncio.to_thread(scheduler.get_jobs):
+            if not job.id.startswith("settlement_"):
+                continue
+            for task, isin in job.kwargs["events"]:
                 result.append({"isin": isin, "task": task, "time": job.next_run_time})  # Время запуска
         result.sort(key=itemgetter("time"))
         return result
 
 
 if __name__ == "__main__":
-    asyncio.run(SchedulerService._part_redemption(isin="RU000A104SU6"))
+    asyncio.run(SchedulerService._refresh_quotes())
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import date
+from operator import itemgetter
+
+from config import config
+from create_app import logger
+from models.schemas import BondEventDTO
+from models.sql_dao import BondEventsDAO
+from services.moex import BONDIZATION_COLUMNS, MoexAPI, MoexRow, MoexSnapshot, parse_date, parse_float
+
+
+class ScheduleService:
+    """Графики купонов, амортизаций и оферт из ISS bondization, сохранённые в bond_events."""
+
+    @staticmethod
+    def __to_records(isin: str, payload: dict) -> list[dict]:
+        # ISS отдаёт колонки в порядке своей таблицы, а не запрошенном - разбираем по именам
+        rows = {}
+        for block, columns in BONDIZATION_COLUMNS.items():
+            getter = itemgetter(*map(payload[block]["columns"].index, columns))
+            rows[block] = map(getter, payload[block]["data"])
+        records = {}
+        for event_date, value in rows["coupons"]:
+            records[(parse_date(event_date), "coupon")] = parse_float(value)
+        for event_date, value, data_source in rows["amortizations"]:
+            kind = "maturity" if data_source == "maturity" else "amortization"
+            records[(parse_date(event_date), kind)] = parse_float(value)
+        for event_date, price in rows["offers"]:
+            records[(parse_date(event_date), "offer")] = parse_float(price)
+        return [
+            {"isin": isin, "event_date": event_date, "kind": kind, "value": value}
+            for (event_date, kind), value in sorted(records.items())
+            if event_date is not None
+        ]
+
+    @classmethod
+    async def __refresh_one(cls, isin: str, stored: list[dict], semaphore: asyncio.Semaphore) -> bool:
+        async with semaphore:
+            payload = await MoexAPI.get_bondization(isin=isin)
+        records = cls.__to_records(isin=isin, payload=payload)
+        if records == stored:
+            return False
+        await BondEventsDAO.replace(isin=isin, data=records)
+        logger.info(f"График {isin} обновлён: {len(records)} событий")
+        return True
+
+    @classmethod
+    async def refresh(cls, isins: list[str]) -> list[str]:
+        """Перечитывает графики с MOEX и перезаписывает только изменившиеся; возвращает их isin."""
+        stored = {isin: [] for isin in isins}
+        for event in await BondEventsDAO.get_many(isins=isins):
+            stored[event.isin].append(event.model_dump())
+        semaphore = asyncio.Semaphore(config.moex_history_concurrency)
+        results = await asyncio.gather(
+            *(cls.__refresh_one(isin=isin, stored=stored[isin], semaphore=semaphore) for isin in isins),
+            return_exceptions=True,
+        )
+        changed = []
+        for isin, result in zip(isins, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Не удалось получить график {isin}: {result!r}")
+            elif result:
+                changed.append(isin)
+        return changed
+
+    @classmethod
+    async def get_many(cls, isins: list[str], fetch_missing: bool = False) -> dict[str, list[BondEventDTO]]:
+        events = {}
+        for event in await BondEventsDAO.get_many(isins=isins):
+            events.setdefault(event.isin, []).append(event)
+        missing = [isin for isin in isins if isin not in events]
+        if fetch_missing and missing:
+            await cls.refresh(isins=missing)
+            for event in await BondEventsDAO.get_many(isins=missing):
+                events.setdefault(event.isin, []).append(event)
+        return events
+
+    @staticmethod
+    def cash_flows(row: MoexRow, events: list[BondEventDTO], today: date) -> list[tuple[date, float]]:
+        """Платежи на одну бумагу до оферты/погашения; остаток номинала - в дату оферты/погашения."""
+        redemption_date = parse_date(row.buybackdate) or parse_date(row.matdate)
+        if redemption_date is None or redemption_date < today:
+            return []
+        coupon_value = parse_float(row.couponvalue) or 0
+        flows = []
+        amortized = 0
+        for event in events:
+            if event.event_date < today or event.event_date > redemption_date:
+                continue
+            if event.kind == "coupon":
+                flows.append((event.event_date, event.value if event.value is not None else coupon_value))
+            elif event.kind == "amortization" and event.event_date < redemption_date:
+                flows.append((event.event_date, event.value or 0))
+                amortized += event.value or 0
+        flows.append((redemption_date, (parse_float(row.facevalue) or 0) - amortized))
+        return flows
+
+    @classmethod
+    async def get_cash_flows(cls, snapshot: MoexSnapshot) -> dict[str, list[tuple[date, float]]]:
+        today = date.today()
+        events = await cls.get_many(isins=list(snapshot.rows))
+        return {
+            isin: cls.cash_flows(row=snapshot.rows[isin], events=bond_events, today=today)
+            for isin, bond_events in events.items()
+        }
@@ -0,0 +1,60 @@
+from datetime import date
+
+import numpy as np
+
+from config import config
+from models.schemas import DohodItem
+from services.analytics import BondAnalytics
+from services.moex import MoexSnapshot, parse_float
+
+
+class BondScreener:
+    """Отбор бумаг по всей доске TQOB/TQCB без обращения к dohod.ru."""
+
+    @staticmethod
+    def screen(
+        snapshot: MoexSnapshot,
+        today: date,
+        limit: int = config.recommendations_limit,
+        max_price: int = config.screener_max_price,
+        min_yield: float = config.screener_min_yield,
+        max_yield: float = config.screener_max_yield,
+        max_duration: float = config.screener_max_duration,
+        min_liquidity: float = config.screener_min_liquidity,
+    ) -> list[DohodItem]:
+        """
+        Ранжирует бумаги по доходности к погашению/оферте.
+        Цена - грязная цена одной бумаги в копейках, доходность - в сотых долях процента, как у dohod.ru.
+        """
+        rows = list(snapshot.rows.values())
+        if not rows:
+            return []
+        prices = BondAnalytics.prices(rows=rows)
+        risk = BondAnalytics.risk_measures(
+            cash_flows=BondAnalytics.estimate_cash_flows(rows=rows, today=today), prices=prices
+        )
+        prices = prices * 100
+        liquidity = np.array([parse_float(row.valtoday) or 0 for row in rows], dtype=float)
+        with np.errstate(invalid="ignore"):
+            mask = (
+                np.isfinite(risk.ytm)
+                & (risk.ytm >= min_yield)
+                & (risk.ytm <= max_yield)
+                & (risk.modified_duration <= max_duration)
+                & (prices <= max_price)
+                & (liquidity >= min_liquidity)
+            )
+        indexes = np.flatnonzero(mask)
+        if len(indexes) > limit:
+            indexes = indexes[np.argpartition(-risk.ytm[indexes], limit - 1)[:limit]]
+        indexes = indexes[np.argsort(-risk.ytm[indexes], kind="stable")]
+        return [
+            DohodItem(
+                isin=rows[i].secid,
+                price=int(prices[i]),
+                price_return=int(risk.ytm[i] * 10000),
+                liquidity=float(liquidity[i]),
+                lot=int(parse_float(rows[i].lotsize) or 1),
+            )
+            for i in indexes.tolist()
+        ]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+
+from aiogram.types import Update
+
+from config import config
+from create_app import bot, dp, logger
+from models.schemas import UpdateQueueStateDTO
+
+
+class UpdateQueue:
+    """
+    Приём вебхука без ожидания обработчиков: апдейт кладётся в очередь своего шарда и сразу получает 200.
+    Шард выбирается по чату, у каждого шарда один воркер - сообщения одного чата обрабатываются по порядку.
+    Повторы Telegram (тот же update_id) отбрасываются, переполненная очередь отвечает отказом.
+    """
+
+    __queues: list[asyncio.Queue] = []
+    __workers: list[asyncio.Task] = []
+    __seen: set[int] = set()
+    __seen_order: deque = deque()
+    counters: dict[str, int] = {}
+    in_flight: int = 0
+    max_wait: float = 0
+
+    @classmethod
+    def start(cls):
+        cls.__queues = [asyncio.Queue(maxsize=config.webhook_queue_size) for _ in range(config.webhook_workers)]
+        cls.__workers = [asyncio.create_task(cls.__work(queue=queue)) for queue in cls.__queues]
+        cls.__seen, cls.__seen_order = set(), deque()
+        cls.counters = {"received": 0, "duplicates": 0, "rejected": 0, "processed": 0, "failed": 0}
+        cls.in_flight, cls.max_wait = 0, 0
+
+    @staticmethod
+    def __shard_key(update: Update) -> int:
+        try:
+            event = update.event
+        except Exception:
+            return update.update_id
+        chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        return user.id if user is not None else update.update_id
+
+    @classmethod
+    def __remember(cls, update_id: int):
+        cls.__seen.add(update_id)
+        cls.__seen_order.append(update_id)
+        if len(cls.__seen_order) > config.webhook_dedup_size:
+            cls.__seen.discard(cls.__seen_order.popleft())
+
+    @classmethod
+    def put(cls, update: Update) -> bool:
+        """False - очередь шарда заполнена, Telegram повторит доставку позже."""
+        cls.counters["received"] += 1
+        if update.update_id in cls.__seen:
+            cls.counters["duplicates"] += 1
+            return True
+        queue = cls.__queues[cls.__shard_key(update) % len(cls.__queues)]
+        try:
+            queue.put_nowait((time.monotonic(), update))
+        except asyncio.QueueFull:
+            cls.counters["rejected"] += 1
+            logger.warning(f"Очередь апдейтов заполнена, update_id={update.update_id} отклонён")
+            return False
+        cls.__remember(update.update_id)
+        return True
+
+    @classmethod
+    async def __work(cls, queue: asyncio.Queue):
+        while True:
+            queued_at, update = await queue.get()
+            cls.max_wait = max(cls.max_wait, time.monotonic() - queued_at)
+            cls.in_flight += 1
+            try:
+                await dp.feed_update(bot=bot, update=update)
+            except Exception as ex:
+                cls.counters["failed"] += 1
+                logger.exception(f"Ошибка обработки update_id={update.update_id}: {ex!r}")
+            else:
+                cls.counters["processed"] += 1
+            finally:
+                cls.in_flight -= 1
+                queue.task_done()
+
+    @classmethod
+    def state(cls) -> UpdateQueueStateDTO:
+        depths = [queue.qsize() for queue in cls.__queues]
+        return UpdateQueueStateDTO(
+            workers=len(cls.__workers),
+            capacity=config.webhook_queue_size * len(cls.__queues),
+            queued=sum(depths),
+            max_shard_depth=max(depths, default=0),
+            in_flight=cls.in_flight,
+            max_wait=round(cls.max_wait, 3),
+            **cls.counters,
+        )
+
+    @classmethod
+    async def stop(cls):
+        """Дорабатывает принятое (не дольше webhook_drain_timeout) и снимает воркеры."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in cls.__queues)), timeout=config.webhook_drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Очередь апдейтов не разобрана до остановки: {cls.state().queued} шт.")
+        for worker in cls.__workers:
+            worker.cancel()
+        await asyncio.gather(*cls.__workers, return_exceptions=True)
+        cls.__workers = []
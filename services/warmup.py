@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterable
+
+from config import config
+from create_app import logger
+from models.schemas import WarmUpStateDTO
+
+
+class WarmUp:
+    """
+    Фоновый прогрев после старта: приложение уже принимает запросы,
+    пока шаги (вебхук, сверка задач, кэши) выполняются параллельно.
+    Обязательные шаги повторяются с растущей паузой, пока не выполнятся: без вебхука бот глух,
+    а перезапуск процесса по ошибке старта больше не происходит.
+    """
+
+    steps: dict[str, str] = {}
+    required: set[str] = set()
+    started_at: float | None = None
+    finished_at: float | None = None
+    __task: asyncio.Task | None = None
+
+    @classmethod
+    def start(cls, steps: dict[str, Callable[[], Awaitable]], required: Iterable[str] = ()):
+        cls.steps = {name: "pending" for name in steps}
+        cls.required = set(required)
+        cls.started_at = time.monotonic()
+        cls.finished_at = None
+        cls.__task = asyncio.create_task(cls.__run(steps=steps))
+
+    @classmethod
+    async def __run_step(cls, name: str, step: Callable[[], Awaitable]):
+        cls.steps[name] = "running"
+        started = time.monotonic()
+        delay = config.warmup_retry_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await step()
+            except Exception as ex:
+                cls.steps[name] = f"failed: {ex!r}"
+                if name not in cls.required:
+                    logger.warning(f"Прогрев: шаг {name} завершился ошибкой: {ex!r}")
+                    return None
+                logger.warning(f"Прогрев: шаг {name}, попытка {attempt}: {ex!r}, повтор через {delay:.0f} с")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, config.warmup_retry_max_delay)
+            else:
+                cls.steps[name] = "ok"
+                logger.info(f"Прогрев: шаг {name} выполнен за {time.monotonic() - started:.2f} с")
+                return None
+
+    @classmethod
+    async def __run(cls, steps: dict[str, Callable[[], Awaitable]]):
+        await asyncio.gather(*(cls.__run_step(name=name, step=step) for name, step in steps.items()))
+        cls.finished_at = time.monotonic()
+        logger.info(f"Прогрев завершён за {cls.finished_at - cls.started_at:.2f} с")
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls.finished_at is not None and all(cls.steps.get(name) == "ok" for name in cls.required)
+
+    @classmethod
+    def state(cls) -> WarmUpStateDTO:
+        elapsed = None
+        if cls.started_at is not None:
+            elapsed = round((cls.finished_at or time.monotonic()) - cls.started_at, 3)
+        return WarmUpStateDTO(
+            ready=cls.is_ready(), finished=cls.finished_at is not None, elapsed=elapsed, steps=dict(cls.steps)
+        )
+
+    @classmethod
+    async def wait(cls):
+        if cls.__task is not None:
+            await asyncio.shield(cls.__task)
+
+    @classmethod
+    async def stop(cls):
+        if cls.__task is not None and not cls.__task.done():
+            cls.__task.cancel()
+            try:
+                await cls.__task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,16 @@
+import os
+
+# Настройки читаются при импорте config; для тестов хватает заглушек, сеть и Postgres не нужны
+for name, value in {
+    "BOT_TOKEN": "123456:TEST",
+    "ADMIN_IDS": "[1]",
+    "WEBHOOK_URL": "https://example.com",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "INNER_PORT": "8000",
+    "OUTER_PORT": "8000",
+}.items():
+    os.environ.setdefault(name, value)
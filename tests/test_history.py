@@ -0,0 +1,47 @@
+import asyncio
+from datetime import date
+
+from services import history
+from services.history import HistoryService
+
+# Порядок колонок таблицы ISS history: VALUE раньше CLOSE, ACCINT раньше WAPRICE
+ISS_COLUMNS = ["BOARDID", "TRADEDATE", "VALUE", "VOLUME", "CLOSE", "ACCINT", "WAPRICE", "YIELDCLOSE"]
+ROWS = [
+    ["TQCB", "2026-10-01", 1500000.0, 1500, 99.5, 12.3, 99.4, 14.2],
+    ["TQCB", "2026-10-02", 2000000.0, 2000, 99.7, 12.5, 99.6, 14.1],
+    ["PSAU", "2026-10-02", 1.0, 1, 1.0, 1.0, 1.0, 1.0],
+]
+
+
+def test_backfill_decodes_reordered_columns(monkeypatch):
+    saved = []
+
+    async def get_many():
+        return []
+
+    async def get_isins():
+        return []
+
+    async def get_last_dates(isins):
+        return {}
+
+    async def copy_many(records):
+        saved.extend(records)
+
+    async def get_history_page(isin, date_from=None, start=0):
+        return {
+            "history": {"columns": ISS_COLUMNS, "data": ROWS},
+            "history.cursor": {"columns": ["INDEX", "TOTAL", "PAGESIZE"], "data": [[0, len(ROWS), 100]]},
+        }
+
+    monkeypatch.setattr(history.BondsDAO, "get_many", get_many)
+    monkeypatch.setattr(history.BondHistoryDAO, "get_isins", get_isins)
+    monkeypatch.setattr(history.BondHistoryDAO, "get_last_dates", get_last_dates)
+    monkeypatch.setattr(history.BondHistoryDAO, "copy_many", copy_many)
+    monkeypatch.setattr(history.MoexAPI, "get_history_page", get_history_page)
+
+    assert asyncio.run(HistoryService.backfill(isins=["RU000A0JX0J2"])) == 2
+    assert saved == [
+        ("RU000A0JX0J2", date(2026, 10, 1), 99.5, 99.4, 14.2, 12.3, 1500, 1500000.0),
+        ("RU000A0JX0J2", date(2026, 10, 2), 99.7, 99.6, 14.1, 12.5, 2000, 2000000.0),
+    ]
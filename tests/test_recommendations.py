@@ -0,0 +1,119 @@
+import asyncio
+import random
+
+import pytest
+
+from config import config
+from models.schemas import BondQuoteDTO, DohodItem
+from services import dohod
+from services.dohod import BuyRecommendation
+
+
+def greedy(dohod_bonds: list[DohodItem], budget: int) -> dict[str, int]:
+    """Распределение до перехода на кучу: пересортировка всего списка на каждую бумагу."""
+    dohod_bonds.sort(key=lambda x: -x.price_return)
+    result = {}
+    while True:
+        candidate = sorted(dohod_bonds, key=lambda x: (x.amount * x.price, -x.price_return))[0]
+        if budget < candidate.price:
+            break
+        candidate.amount += 1
+        budget -= candidate.price
+        result[candidate.isin] = result.get(candidate.isin, 0) + 1
+    return result
+
+
+def random_items(rng: random.Random) -> list[DohodItem]:
+    # Узкие диапазоны цен и доходностей, чтобы чаще попадать в равенства ключей
+    return [
+        DohodItem(
+            isin=f"RU{i:010d}",
+            price=rng.choice([50000, 75000, 100000, rng.randint(1000, 150000)]),
+            price_return=rng.randint(500, 520),
+            amount=rng.choice([0, 0, 1, rng.randint(0, 20)]),
+        )
+        for i in range(rng.randint(1, 12))
+    ]
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_heap_matches_greedy(seed):
+    rng = random.Random(seed)
+    items = random_items(rng=rng)
+    budget = rng.randint(0, 3_000_000)
+    expected = greedy(dohod_bonds=[item.model_copy() for item in items], budget=budget)
+    assert BuyRecommendation(dohod_bonds=items).get(budget=budget) == expected
+
+
+def test_lot_and_cash_reserve():
+    items = [DohodItem(isin="A", price=100, price_return=900, lot=10), DohodItem(isin="B", price=100, price_return=800)]
+    result = BuyRecommendation(dohod_bonds=items).get(budget=2500, cash_reserve=500)
+    assert result == {"A": 10, "B": 10}
+    assert sum(amount * 100 for amount in result.values()) <= 2000
+
+
+def test_min_liquidity_skips_illiquid():
+    items = [
+        DohodItem(isin="A", price=100, price_return=900, liquidity=10),
+        DohodItem(isin="B", price=100, price_return=800, liquidity=1000),
+    ]
+    assert BuyRecommendation(dohod_bonds=items).get(budget=500, min_liquidity=100) == {"B": 5}
+
+
+def test_issuer_weight_caps_issuer():
+    items = [
+        DohodItem(isin="A1", price=100, price_return=900, issuer="X"),
+        DohodItem(isin="A2", price=100, price_return=850, issuer="X"),
+        DohodItem(isin="B", price=100, price_return=800, issuer="Y"),
+    ]
+    result = BuyRecommendation(dohod_bonds=items).get(budget=1000, max_issuer_weight=0.5)
+    assert result["A1"] + result["A2"] <= 5
+    assert sum(result.values()) == 10
+
+
+def test_create_fills_dohod_liquidity(monkeypatch):
+    async def load_universe():
+        return [["RU000A0001", 100000.0, 18.5], ["RU000A0002", 95000.0, 17.0], ["RU000A0003", 99000.0, 16.0]]
+
+    async def get_quotes(isins=None):
+        turnover = {"RU000A0001": 5_000_000.0, "RU000A0002": 10.0, "RU000A0003": 2_000_000.0}
+        return [
+            BondQuoteDTO(
+                isin=isin,
+                title=isin,
+                face_value=1000,
+                price=99.0,
+                accrued_int=0,
+                coupon_value=None,
+                coupon_date=None,
+                maturity_date=None,
+                buyback_date=None,
+                coupon_period=0,
+                turnover=turnover[isin],
+            )
+            for isin in isins
+        ]
+
+    monkeypatch.setattr(config, "recommendations_source", "dohod")
+    monkeypatch.setattr(dohod.dohod_cache, "get", load_universe)
+    monkeypatch.setattr(dohod.BondQuotesDAO, "get_many", get_quotes)
+
+    service = asyncio.run(BuyRecommendation.create(bonds=[]))
+    assert {bond.isin: bond.liquidity for bond in service.dohod_bonds} == {
+        "RU000A0001": 5_000_000.0,
+        "RU000A0002": 10.0,
+        "RU000A0003": 2_000_000.0,
+    }
+    result = service.get(budget=400000, min_liquidity=1_000_000)
+    assert set(result) == {"RU000A0001", "RU000A0003"}
+
+
+def test_issuer_weight_counts_whole_portfolio():
+    # Эмитент X уже занимает 900 из 1000 портфеля: при доле 0.5 от (1000 + 1000) докупить можно на 100
+    items = [
+        DohodItem(isin="A1", price=100, price_return=900, issuer="X"),
+        DohodItem(isin="B", price=100, price_return=800, issuer="Y"),
+    ]
+    service = BuyRecommendation(dohod_bonds=items, issuer_values={"X": 900, "Z": 100}, portfolio_value=1000)
+    result = service.get(budget=1000, max_issuer_weight=0.5)
+    assert result == {"A1": 1, "B": 9}
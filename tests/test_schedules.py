@@ -0,0 +1,40 @@
+import asyncio
+from datetime import date
+
+from services import schedules
+from services.schedules import ScheduleService
+
+ISIN = "RU000A0JX0J2"
+# Порядок колонок таблиц ISS bondization: value и price стоят перед датами
+PAYLOAD = {
+    "coupons": {"columns": ["isin", "value", "coupondate"], "data": [[ISIN, 35.9, "2026-12-01"]]},
+    "amortizations": {
+        "columns": ["isin", "data_source", "value", "amortdate"],
+        "data": [[ISIN, "maturity", 1000.0, "2027-06-01"]],
+    },
+    "offers": {"columns": ["isin", "price", "offerdate"], "data": [[ISIN, 100.0, "2027-03-01"]]},
+}
+
+
+def test_refresh_decodes_reordered_columns(monkeypatch):
+    saved = {}
+
+    async def get_many(isins):
+        return []
+
+    async def replace(isin, data):
+        saved[isin] = data
+
+    async def get_bondization(isin):
+        return PAYLOAD
+
+    monkeypatch.setattr(schedules.BondEventsDAO, "get_many", get_many)
+    monkeypatch.setattr(schedules.BondEventsDAO, "replace", replace)
+    monkeypatch.setattr(schedules.MoexAPI, "get_bondization", get_bondization)
+
+    assert asyncio.run(ScheduleService.refresh(isins=[ISIN])) == [ISIN]
+    assert saved[ISIN] == [
+        {"isin": ISIN, "event_date": date(2026, 12, 1), "kind": "coupon", "value": 35.9},
+        {"isin": ISIN, "event_date": date(2027, 3, 1), "kind": "offer", "value": 100.0},
+        {"isin": ISIN, "event_date": date(2027, 6, 1), "kind": "maturity", "value": 1000.0},
+    ]
@@ -4,9 +4,10 @@ from aiogram.types import Message
 
 from config import config
 from models.schemas import DbBondDTO
-from models.sql_dao import BondsDAO, MoneyBalanceDAO, TransactionsDAO
+from models.sql_dao import BondsDAO, MoneyBalanceDAO, TransactionsDAO, unit_of_work
 from services.dohod import BuyRecommendation
 from services.moex import MoexAPI
+from services.quotes import QuotesService
 from services.scheduler_service import SchedulerService
 
 router = Router()
@@ -14,7 +15,7 @@ router = Router()
 
 @router.message(Command("start"))
 async def start_handler(message: Message):
-    text = "Введи ISIN и количество через пробел"
+    text = "Введи ISIN и количество через пробел - по паре на строку, можно файлом"
     await message.answer(text=text)
 
 
@@ -22,11 +23,16 @@ async def start_handler(message: Message):
 async def get_recommendations_handler(message: Message):
     text = "Список рекомендаций:\n"
     sql_bonds = await BondsDAO.get_many()
-    bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds)
+    snapshot = await QuotesService.get_snapshot(isins=[sql_bond.isin for sql_bond in sql_bonds])
+    bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds, snapshot=snapshot)
     service = await BuyRecommendation.create(bonds=bonds)
-    balances = await MoneyBalanceDAO.get_many()
-    balance = sum(balance.amount for balance in balances)
-    result = service.get(budget=balance)
+    balance = await MoneyBalanceDAO.get_total()
+    result = service.get(
+        budget=balance,
+        max_issuer_weight=config.recommendations_max_issuer_weight,
+        min_liquidity=config.recommendations_min_liquidity,
+        cash_reserve=config.recommendations_cash_reserve,
+    )
     if len(result) == 0:
         await message.answer(text="Нет рекомендаций")
         return None
@@ -39,7 +45,7 @@ async def get_recommendations_handler(message: Message):
 @router.message(Command("tasks"))
 async def get_tasks_handler(message: Message):
     text = "Список задач:\n"
-    tasks = SchedulerService.get_scheduled_tasks()
+    tasks = await SchedulerService.get_scheduled_tasks()
     if len(tasks) == 0:
         await message.answer(text="Нет задач")
         return None
@@ -56,58 +62,108 @@ async def get_balance_handler(message: Message):
     except (IndexError, ValueError):
         text = "Неправильно"
         return await message.answer(text=text)
-    current_value = await MoneyBalanceDAO.get_total()
-    if value < 0:
-        if current_value + value < 0:
-            text = "Баланс не может быть отрицательным"
-            return await message.answer(text=text)
-    await MoneyBalanceDAO.create_with_return_id(amount=value, description="deposit")
+    async with unit_of_work():
+        current_value = await MoneyBalanceDAO.lock_total()
+        if value < 0:
+            if current_value + value < 0:
+                text = "Баланс не может быть отрицательным"
+                return await message.answer(text=text)
+        await MoneyBalanceDAO.create_with_return_id(amount=value, description="deposit")
     text = "Сохранили"
     await message.answer(text=text)
     return None
 
 
-@router.message(F.text)
-async def get_bond_handler(message: Message):
-    if message.from_user.id not in config.admin_ids:
-        text = "🔧 В данный момент бот недоступен. Обратитесь к администратору."
-        return await message.answer(text=text)
-    try:
-        parts = message.text.split(" ")
-        isin = parts[0]
-        amount = int(parts[1])
-    except (IndexError, ValueError):
-        text = "Неправильный формат сообщения. Используйте: ISIN количество."
-        return await message.answer(text=text)
-    fake_sql_bond = DbBondDTO(isin=isin, amount=amount, id=0, cur_nominal=1000, cur_coupon=0)
-    moex_bond = await MoexAPI.get_one_bond_profile(db_bond=fake_sql_bond)
-    if not moex_bond:
-        text = "Облигация не найдена по указанному ISIN."
+def parse_bond_lines(lines: list[str]) -> tuple[dict[str, int], list[str]]:
+    """Пары "ISIN количество" по строке; повторы одной бумаги складываются, нераспознанные строки - в ошибки."""
+    pairs, errors = {}, []
+    for line in lines:
+        parts = line.replace(";", " ").replace(",", " ").split()
+        if not parts:
+            continue
+        try:
+            isin, amount = parts[0].upper(), int(parts[1])
+        except (IndexError, ValueError):
+            errors.append(line.strip())
+            continue
+        if amount <= 0:
+            errors.append(line.strip())
+            continue
+        pairs[isin] = pairs.get(isin, 0) + amount
+    return pairs, errors
+
+
+async def buy_bonds(message: Message, lines: list[str]):
+    """Один снимок доски, одна проверка остатка и одна транзакция на всю пачку; задачи - одной сверкой."""
+    pairs, errors = parse_bond_lines(lines=lines)
+    if errors or not pairs:
+        text = "Неправильный формат сообщения. Используйте: ISIN количество (по паре на строку)."
+        if errors:
+            text += "\nНе разобраны строки:\n" + "\n".join(errors)
         return await message.answer(text=text)
-    sql_bond = await BondsDAO.get_one_or_none(isin=isin)
-    if sql_bond:
-        result = await TransactionsDAO.update_bond(
-            isin=isin,
-            amount=amount,
-            price=moex_bond.price,
-            nominal=moex_bond.nominal,
-            coupon=moex_bond.coupon_price,
-        )
-    else:
-        result = await TransactionsDAO.create_bond(
-            isin=isin,
-            amount=amount,
-            nominal=moex_bond.nominal,
-            price=moex_bond.price,
-            coupon=moex_bond.coupon_price,
-        )
-        await SchedulerService.set_bond(
-            isin=isin, coupon_date=moex_bond.coupon_date, redemption_date=moex_bond.redemption_date
-        )
+    bonds, missing = [], []
+    async with unit_of_work():
+        snapshot = await QuotesService.get_snapshot(isins=list(pairs))
+        for isin, amount in pairs.items():
+            fake_sql_bond = DbBondDTO(isin=isin, amount=amount, id=0, cur_nominal=1000, cur_coupon=0)
+            moex_bond = snapshot.get_bond(sql_bond=fake_sql_bond)
+            if not moex_bond:
+                missing.append(isin)
+                continue
+            bonds.append(
+                {
+                    "isin": isin,
+                    "amount": amount,
+                    "title": moex_bond.title,
+                    "price": moex_bond.price,
+                    "nominal": moex_bond.nominal,
+                    "coupon": moex_bond.coupon_price,
+                }
+            )
+        if missing:
+            # Пачку проводим целиком или никак, чтобы исправленное сообщение можно было просто отправить снова
+            text = "Облигации не найдены или без цены за прошлый день:\n"
+            text += "\n".join(f"<code>{isin}</code>" for isin in missing)
+            return await message.answer(text=text)
+        held = {sql_bond.isin for sql_bond in await BondsDAO.get_many()}
+        result = await TransactionsDAO.buy_bonds(bonds=bonds)
     if not result:
         text = "Баланс не может быть отрицательным"
         await message.answer(text=text)
         return None
-    text = "Сохранили"
+    new_isins = [bond["isin"] for bond in bonds if bond["isin"] not in held]
+    if new_isins:
+        # Задачи ставим после фиксации, когда бумаги уже видны в bonds
+        await SchedulerService.schedule_bonds(isins=new_isins)
+    total = sum(bond["price"] for bond in bonds)
+    text = "Сохранили:\n"
+    for bond in bonds:
+        text += f"<code>{bond['isin']}</code> {bond['title']} - {bond['amount']} шт. - {round(bond['price']/100, 2)}₽\n"
+    text += f"Итого: <i>{round(total/100, 2)}₽</i>"
     await message.answer(text=text)
     return None
+
+
+@router.message(F.document)
+async def get_bonds_document_handler(message: Message):
+    if message.from_user.id not in config.admin_ids:
+        text = "🔧 В данный момент бот недоступен. Обратитесь к администратору."
+        return await message.answer(text=text)
+    if message.document.file_size and message.document.file_size > config.bonds_file_max_size:
+        text = "Файл слишком большой"
+        return await message.answer(text=text)
+    file = await message.bot.download(message.document)
+    try:
+        lines = file.read().decode("utf-8-sig").splitlines()
+    except UnicodeDecodeError:
+        text = "Файл должен быть текстовым (UTF-8): ISIN количество по паре на строку"
+        return await message.answer(text=text)
+    return await buy_bonds(message=message, lines=lines)
+
+
+@router.message(F.text)
+async def get_bond_handler(message: Message):
+    if message.from_user.id not in config.admin_ids:
+        text = "🔧 В данный момент бот недоступен. Обратитесь к администратору."
+        return await message.answer(text=text)
+    return await buy_bonds(message=message, lines=message.text.splitlines())
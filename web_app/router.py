@@ -1,9 +1,16 @@
 from fastapi import APIRouter
 from fastapi.requests import Request
+from fastapi.responses import JSONResponse
 
 from create_app import templates
+from models.schemas import PortfolioAnalyticsDTO, UpdateQueueStateDTO, WarmUpStateDTO
 from models.sql_dao import BondsDAO, MoneyBalanceDAO
+from services.analytics import BondAnalytics
 from services.moex import MoexAPI
+from services.quotes import QuotesService
+from services.schedules import ScheduleService
+from services.update_queue import UpdateQueue
+from services.warmup import WarmUp
 
 router = APIRouter()
 
@@ -11,23 +18,55 @@ router = APIRouter()
 @router.get("/")
 async def get_bonds(request: Request):
     sql_bonds = await BondsDAO.get_many()
-    bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds)
+    snapshot = await QuotesService.get_snapshot(isins=[sql_bond.isin for sql_bond in sql_bonds])
+    bonds = await MoexAPI.get_bonds_profiles(sql_bonds=sql_bonds, snapshot=snapshot)
+    analytics = BondAnalytics.for_bonds(
+        sql_bonds=sql_bonds, snapshot=snapshot, schedules=await ScheduleService.get_cash_flows(snapshot=snapshot)
+    )
     total_amount = sum(bond.amount for bond in bonds)
     total_nominal = sum(bond.nominal for bond in bonds) / 100
     total_price = round(number=sum(bond.price for bond in bonds) / 100, ndigits=2)
-    balances = await MoneyBalanceDAO.get_many()
-    balance = sum(balance.amount for balance in balances)
-    total_deposits = sum(balance.amount for balance in balances if balance.description == "deposit")
-    difference = balance + total_price * 100 - total_deposits
+    ledger = await MoneyBalanceDAO.get_summary()
+    difference = ledger.balance + total_price * 100 - ledger.deposits
     return templates.TemplateResponse(
         "bonds_table.html",
         {
             "request": request,
             "bonds": bonds,
+            "analytics": {bond.isin: bond for bond in analytics.bonds},
+            "portfolio": analytics,
             "total_amount": total_amount,
             "total_price": total_price,
             "total_nominal": total_nominal,
-            "current_balance": round(number=balance / 100, ndigits=2),
+            "current_balance": round(number=ledger.balance / 100, ndigits=2),
+            "ledger": ledger,
             "difference": round(number=difference / 100, ndigits=2),
         },
     )
+
+
+@router.get("/analytics")
+async def get_analytics() -> PortfolioAnalyticsDTO:
+    sql_bonds = await BondsDAO.get_many()
+    snapshot = await QuotesService.get_snapshot(isins=[sql_bond.isin for sql_bond in sql_bonds])
+    return BondAnalytics.for_bonds(
+        sql_bonds=sql_bonds, snapshot=snapshot, schedules=await ScheduleService.get_cash_flows(snapshot=snapshot)
+    )
+
+
+@router.get("/health/live")
+async def liveness() -> dict:
+    return {"status": "ok"}
+
+
+@router.get("/health/queue")
+async def update_queue() -> UpdateQueueStateDTO:
+    return UpdateQueue.state()
+
+
+@router.get("/health/ready", responses={503: {"model": WarmUpStateDTO}})
+async def readiness() -> WarmUpStateDTO:
+    state = WarmUp.state()
+    if not state.ready:
+        return JSONResponse(status_code=503, content=state.model_dump())
+    return state